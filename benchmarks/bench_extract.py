@@ -0,0 +1,103 @@
+"""
+Benchmark HTML-to-text extraction backends over a corpus of saved pages.
+
+    python benchmarks/bench_extract.py path/to/pages --repeat 5
+
+Every *.html / *.htm file in the corpus is extracted and cleaned with each
+installed backend. Timings are compared with the original implementation
+(BeautifulSoup html.parser + the two-level split), and each backend's output is
+checked against that implementation with noscript dropped as well, which is
+what every backend now does.
+"""
+import argparse
+import difflib
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from text_extract import DROPPED_TAGS, available_backends, get_backend, normalize_whitespace
+
+
+def legacy_extract(html_content, dropped=("script", "style")):
+    soup = BeautifulSoup(html_content, 'html.parser')
+    for script in soup(list(dropped)):
+        script.decompose()
+    return soup.get_text()
+
+
+def legacy_clean(content):
+    lines = (line.strip() for line in content.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return '\n'.join(chunk for chunk in chunks if chunk)
+
+
+def load_corpus(directory):
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(directory, "**", "*.htm*"), recursive=True)):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            pages[os.path.relpath(path, directory)] = f.read()
+    return pages
+
+
+def time_pipeline(extract, clean, pages, repeat):
+    """Best-of-repeat seconds per page, and the output of the last run"""
+    timings = {}
+    outputs = {}
+    for name, html_content in pages.items():
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            outputs[name] = clean(extract(html_content))
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+    return timings, outputs
+
+
+def first_difference(expected, actual):
+    diff = difflib.unified_diff(expected.splitlines(), actual.splitlines(), "reference", "backend", n=0, lineterm="")
+    return "\n".join(list(diff)[:8])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="directory of saved .html pages")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per page; the fastest counts")
+    parser.add_argument("--backends", nargs="*", default=available_backends())
+    parser.add_argument("--show-diffs", action="store_true", help="print the first lines that differ")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus)
+    if not pages:
+        sys.exit(f"No .html pages found under {args.corpus}")
+    total_mb = sum(len(html_content.encode("utf-8")) for html_content in pages.values()) / (1024 * 1024)
+    print(f"{len(pages)} pages, {total_mb:.1f} MB, best of {args.repeat}")
+
+    legacy_timings, _ = time_pipeline(legacy_extract, legacy_clean, pages, args.repeat)
+    _, reference = time_pipeline(lambda h: legacy_extract(h, DROPPED_TAGS), legacy_clean, pages, 1)
+    legacy_total = sum(legacy_timings.values())
+
+    print(f"{'backend':<12}{'total ms':>10}{'median ms':>11}{'max ms':>9}{'speedup':>9}{'matching':>10}")
+    print(f"{'legacy':<12}{legacy_total * 1000:>10.1f}{statistics.median(legacy_timings.values()) * 1000:>11.2f}"
+          f"{max(legacy_timings.values()) * 1000:>9.1f}{1.0:>8.1f}x{'-':>10}")
+
+    for backend in args.backends:
+        timings, outputs = time_pipeline(get_backend(backend), normalize_whitespace, pages, args.repeat)
+        mismatched = [name for name in pages if outputs[name] != reference[name]]
+        total = sum(timings.values())
+        print(f"{backend:<12}{total * 1000:>10.1f}{statistics.median(timings.values()) * 1000:>11.2f}"
+              f"{max(timings.values()) * 1000:>9.1f}{legacy_total / total:>8.1f}x"
+              f"{len(pages) - len(mismatched):>5}/{len(pages):<4}")
+        if args.show_diffs:
+            for name in mismatched:
+                print(f"  {name}:\n{first_difference(reference[name], outputs[name])}")
+
+
+if __name__ == "__main__":
+    main()
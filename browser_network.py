@@ -0,0 +1,175 @@
+import base64
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Google embeds result metadata as ["<url>",<height>,<width>] arrays in inline scripts
+EMBEDDED_IMAGE_PATTERN = re.compile(r'\["(https?://[^"]+?)",(\d+),(\d+)\]')
+
+# Hosts that only serve thumbnails, never the original image
+THUMBNAIL_HOSTS = ('encrypted-tbn0.gstatic.com', 'encrypted-tbn1.gstatic.com',
+                   'encrypted-tbn2.gstatic.com', 'encrypted-tbn3.gstatic.com')
+
+
+def enable_performance_logging(options):
+    """Ask chromedriver to record DevTools network events (read with driver.get_log)"""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    return options
+
+
+def extract_embedded_image_urls(html: str, min_width: int = 300,
+                                min_height: int = 300) -> List[Tuple[str, int, int]]:
+    """
+    Pull full-resolution image URLs with their dimensions out of JSON embedded in the page
+    Returns deduplicated (url, width, height) in page order.
+    """
+    # Results loaded by XHR arrive as JSON inside a JSON string, with escaped quotes
+    if '\\"' in html:
+        html = html + html.replace('\\\\', '\\').replace('\\"', '"')
+
+    seen = set()
+    results = []
+    for match in EMBEDDED_IMAGE_PATTERN.finditer(html):
+        try:
+            # Decode \uXXXX escapes the same way the page's JS would
+            url = json.loads(f'"{match.group(1)}"')
+        except ValueError:
+            continue
+        height, width = int(match.group(2)), int(match.group(3))
+        if url in seen or url.startswith(THUMBNAIL_HOSTS, url.find('//') + 2):
+            continue
+        if width < min_width or height < min_height:
+            continue
+        seen.add(url)
+        results.append((url, width, height))
+    return results
+
+
+class NetworkRecorder:
+    """
+    Collects image responses from chromedriver's performance log.
+    The driver must be started with enable_performance_logging(). Each poll()
+    drains the log, so one recorder should own a driver's log for a session.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.responses: Dict[str, Dict] = OrderedDict()
+        self._by_request: Dict[str, str] = {}
+        # Finished XHR/fetch responses whose bodies have not been read yet
+        self._pending_data: List[str] = []
+        self._data_requests = set()
+
+    def poll(self) -> int:
+        """Read new log entries; returns how many image responses are known"""
+        try:
+            entries = self.driver.get_log("performance")
+        except Exception:
+            return len(self.responses)  # performance logging not enabled
+
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            method = message.get("method")
+            params = message.get("params", {})
+
+            if method == "Network.responseReceived":
+                response = params.get("response", {})
+                url = response.get("url", "")
+                mime_type = response.get("mimeType", "")
+                if not url.startswith("http"):
+                    continue
+                if params.get("type") in ("XHR", "Fetch"):
+                    self._data_requests.add(params.get("requestId"))
+                    continue
+                if params.get("type") != "Image" and not mime_type.startswith("image/"):
+                    continue
+                self.responses[url] = {
+                    "request_id": params.get("requestId"),
+                    "mime_type": mime_type,
+                    "status": response.get("status"),
+                    "size": None,
+                    "finished": False,
+                }
+                self._by_request[params.get("requestId")] = url
+            elif method == "Network.loadingFinished":
+                if params.get("requestId") in self._data_requests:
+                    self._data_requests.discard(params.get("requestId"))
+                    self._pending_data.append(params.get("requestId"))
+                    continue
+                url = self._by_request.get(params.get("requestId"))
+                if url in self.responses:
+                    self.responses[url]["size"] = params.get("encodedDataLength")
+                    self.responses[url]["finished"] = True
+
+        return len(self.responses)
+
+    def image_urls(self, min_bytes: int = 0, include_thumbnails: bool = True) -> List[str]:
+        """Image URLs seen so far, in load order"""
+        urls = []
+        for url, info in self.responses.items():
+            if info["status"] and info["status"] >= 400:
+                continue
+            if min_bytes and (info["size"] or 0) < min_bytes:
+                continue
+            if not include_thumbnails and url.startswith(THUMBNAIL_HOSTS, url.find('//') + 2):
+                continue
+            urls.append(url)
+        return urls
+
+    def reset(self):
+        """Drain and forget events from earlier pages (e.g. a previous pool lease)"""
+        self.poll()
+        self.responses.clear()
+        self._by_request.clear()
+        self._pending_data.clear()
+        self._data_requests.clear()
+
+    def request_id(self, url: str) -> Optional[str]:
+        info = self.responses.get(url)
+        return info["request_id"] if info and info["finished"] else None
+
+    def response_body(self, request_id: str) -> bytes:
+        """Fetch a response body the browser already downloaded"""
+        result = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+        if result.get("base64Encoded"):
+            return base64.b64decode(result["body"])
+        return result["body"].encode("utf-8")
+
+    def drain_data_bodies(self) -> List[str]:
+        """Text bodies of XHR/fetch responses finished since the last call"""
+        bodies = []
+        while self._pending_data:
+            request_id = self._pending_data.pop(0)
+            try:
+                bodies.append(self.response_body(request_id).decode("utf-8", "replace"))
+            except Exception:
+                continue  # body evicted from the browser's buffer
+        return bodies
+
+
+class BrowserBodySource:
+    """
+    Serves image bytes the browser already downloaded, for DownloadEngine's body_source.
+    Returns None for URLs the browser didn't load (or has evicted) so the
+    caller falls back to HTTP. Calls are serialized since they share one driver.
+    """
+
+    def __init__(self, recorder: NetworkRecorder):
+        self.recorder = recorder
+        self._lock = threading.Lock()
+
+    def __call__(self, url: str) -> Optional[bytes]:
+        with self._lock:
+            self.recorder.poll()
+            request_id = self.recorder.request_id(url)
+            if request_id is None:
+                return None
+            try:
+                return self.recorder.response_body(request_id)
+            except Exception:
+                return None
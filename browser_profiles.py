@@ -0,0 +1,73 @@
+from typing import Dict, List
+
+# "full" renders pages as a user would see them; "harvest" only needs the DOM
+FULL = "full"
+HARVEST = "harvest"
+PROFILES = (FULL, HARVEST)
+
+# Subresources the harvest profile never downloads. Patterns follow
+# Network.setBlockedURLs wildcards; the trailing * also covers query strings.
+BLOCKED_URL_PATTERNS: List[str] = [
+    "*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.avif*", "*.svg*", "*.ico*", "*.bmp*",
+    "*.css*",
+    "*.woff*", "*.ttf*", "*.otf*", "*.eot*",
+    "*.mp4*", "*.webm*", "*.m3u8*", "*.mp3*", "*.ogg*", "*.wav*",
+    # Google thumbnails are served without a file extension
+    "*encrypted-tbn*.gstatic.com/*",
+]
+
+HARVEST_ARGUMENTS: List[str] = [
+    "--window-size=1280,800",
+    "--blink-settings=imagesEnabled=false",
+    "--mute-audio",
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-sync",
+    "--disable-default-apps",
+    "--disable-component-update",
+    "--disable-background-networking",
+    "--disable-domain-reliability",
+    "--disable-client-side-phishing-detection",
+    "--no-first-run",
+    "--disable-features=Translate,OptimizationHints,MediaRouter,AutofillServerCommunication",
+]
+
+HARVEST_PREFS: Dict[str, int] = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.managed_default_content_settings.media_stream": 2,
+    "profile.default_content_setting_values.notifications": 2,
+    "profile.default_content_setting_values.geolocation": 2,
+}
+
+
+def check_profile(profile: str) -> str:
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown browser profile '{profile}', expected one of {PROFILES}")
+    return profile
+
+
+def apply_profile(options, profile: str = FULL):
+    """
+    Configure Chrome options for a profile before the browser starts
+    harvest loads pages with the eager strategy (DOMContentLoaded) and without
+    images, so it cannot be combined with reusing image bytes from the browser.
+    """
+    if check_profile(profile) == FULL:
+        return options
+    options.page_load_strategy = "eager"
+    for argument in HARVEST_ARGUMENTS:
+        options.add_argument(argument)
+    options.add_experimental_option("prefs", HARVEST_PREFS)
+    return options
+
+
+def activate_profile(driver, profile: str = FULL):
+    """Apply the profile's request blocking to a started driver (Chromium only)"""
+    if check_profile(profile) == FULL:
+        return driver
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    except Exception as e:
+        print(f"Could not block resources for the {profile} profile: {str(e)}")
+    return driver
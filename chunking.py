@@ -0,0 +1,94 @@
+import json
+import re
+from typing import Any, List
+
+# Rough English average; good enough to keep prompts inside num_ctx
+CHARS_PER_TOKEN = 4
+
+# Boundaries tried in order, from most to least structural
+SEPARATORS = [
+    re.compile(r'\n\s*\n'),            # paragraphs / blocks
+    re.compile(r'\n'),                 # lines (clean_body_content emits one phrase per line)
+    re.compile(r'(?<=[.!?])\s+'),      # sentences
+    re.compile(r'\s+'),                # words
+]
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def chunk_budget(num_ctx: int, prompt: str, response_tokens: int = 512) -> int:
+    """Characters of content that fit in num_ctx next to the prompt and the response"""
+    return max(500, (num_ctx - response_tokens - estimate_tokens(prompt)) * CHARS_PER_TOKEN)
+
+
+def _pieces(text: str, max_chars: int, level: int) -> List[str]:
+    """Break text into pieces no longer than max_chars, preferring structural boundaries"""
+    if len(text) <= max_chars:
+        return [text]
+    if level >= len(SEPARATORS):
+        return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+    pieces = []
+    for part in SEPARATORS[level].split(text):
+        if part.strip():
+            pieces.extend(_pieces(part.strip(), max_chars, level + 1))
+    return pieces
+
+
+def split_into_chunks(text: str, max_chars: int) -> List[str]:
+    """
+    Split text into chunks of at most max_chars
+    Whole blocks are packed together where they fit; only oversized blocks are
+    broken further at lines, then sentences, then words.
+    """
+    chunks = []
+    current = ""
+    for piece in _pieces(text.strip(), max_chars, 0):
+        if current and len(current) + 1 + len(piece) > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _item_key(item: Any) -> str:
+    """Identity used for dedup: case and whitespace differences don't count"""
+    if isinstance(item, str):
+        return " ".join(item.lower().split())
+    if isinstance(item, dict):
+        item = {k: _item_key(v) if isinstance(v, str) else v for k, v in item.items()}
+    return json.dumps(item, sort_keys=True, default=str)
+
+
+def _dedupe(items: List[Any]) -> List[Any]:
+    seen = set()
+    unique = []
+    for item in items:
+        key = _item_key(item)
+        if key not in seen:
+            seen.add(key)
+            unique.append(item)
+    return unique
+
+
+def merge_json_results(results: List[Any]) -> Any:
+    """
+    Merge per-chunk JSON results into one
+    Objects are merged key by key (list values concatenated, scalars gathered
+    into lists); anything else is flattened into one list. Duplicates are dropped.
+    """
+    if results and all(isinstance(result, dict) for result in results):
+        merged = {}
+        for result in results:
+            for key, value in result.items():
+                values = value if isinstance(value, list) else [value]
+                merged.setdefault(key, []).extend(v for v in values if v not in (None, "", [], {}))
+        return {key: _dedupe(values) for key, values in merged.items()}
+
+    items = []
+    for result in results:
+        items.extend(result if isinstance(result, list) else [result])
+    return _dedupe(items)
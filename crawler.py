@@ -0,0 +1,191 @@
+import html as html_lib
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+
+from text_extract import extract_text, normalize_whitespace
+
+HREF_PATTERN = re.compile(r'<a\s[^>]*?href\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.I)
+
+# Query parameters that never change page content
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'mc_cid', 'mc_eid')
+
+# Links to files we can't turn into text
+SKIPPED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico', '.pdf', '.zip',
+                      '.gz', '.mp3', '.mp4', '.webm', '.avi', '.mov', '.css', '.js', '.woff', '.woff2')
+
+# "domain": same host as the seed; "subdomains": the seed's site including
+# subdomains; "any": follow every http(s) link
+SCOPES = ("domain", "subdomains", "any")
+
+
+def normalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """
+    Canonical form used for deduplication, or None for non-http(s) or malformed links
+    Resolves relative links, lowercases scheme and host, drops default ports,
+    fragments and tracking parameters, and sorts the query.
+    """
+    try:
+        url = urljoin(base, url.strip()) if base else url.strip()
+        parsed = urlparse(url)
+        port = parsed.port
+    except ValueError:
+        # Bad port ("host:abc") or unbalanced IPv6 brackets
+        return None
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        return None
+    host = parsed.hostname.lower()
+    if ':' in host:
+        host = f"[{host}]"
+    if port and port != {'http': 80, 'https': 443}[parsed.scheme]:
+        host = f"{host}:{port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    )
+    return urlunparse((parsed.scheme, host, parsed.path or '/', '', urlencode(query), ''))
+
+
+def extract_links(html_content: str, base_url: str) -> List[str]:
+    """Normalized, deduplicated links of a page in document order"""
+    links = []
+    seen = set()
+    for match in HREF_PATTERN.finditer(html_content):
+        href = html_lib.unescape(next(group for group in match.groups() if group is not None))
+        url = normalize_url(href, base_url)
+        if url and url not in seen and not urlparse(url).path.lower().endswith(SKIPPED_EXTENSIONS):
+            seen.add(url)
+            links.append(url)
+    return links
+
+
+def site_of(host: str) -> str:
+    """Host without a leading www., used for the "subdomains" scope"""
+    return host[4:] if host.startswith('www.') else host
+
+
+class CrawlJob:
+    """
+    Crawls outward from seed URLs, yielding each page as soon as it is fetched.
+    The frontier is breadth-first and deduplicated on normalized URLs. Up to
+    `workers` pages are fetched at once, with at most `per_domain` in flight per
+    host; pages come through the tiered fetcher, so static pages skip the browser.
+    """
+
+    def __init__(self, seeds: Iterable[str], max_depth: int = 1, scope: str = "domain",
+                 max_pages: int = 100, workers: int = 4, per_domain: int = 2,
+                 fetcher=None, include_html: bool = False, include_text: bool = True):
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown crawl scope '{scope}', expected one of {SCOPES}")
+        self.max_depth = max_depth
+        self.scope = scope
+        self.max_pages = max_pages
+        self.workers = workers
+        self.per_domain = per_domain
+        self.include_html = include_html
+        self.include_text = include_text
+        if fetcher is None:
+            from scrape import get_fetcher
+            fetcher = get_fetcher()
+        self.fetcher = fetcher
+
+        self.seeds = [url for url in (normalize_url(seed) for seed in seeds) if url]
+        self.allowed_hosts = {urlparse(url).netloc for url in self.seeds}
+        self.allowed_sites = {site_of(urlparse(url).hostname) for url in self.seeds}
+        self.frontier = deque((url, 0) for url in dict.fromkeys(self.seeds))
+        self.visited = set(url for url, _ in self.frontier)
+        self.stats = {"fetched": 0, "failed": 0, "discovered": len(self.visited), "elapsed": 0.0}
+        self._stopped = threading.Event()
+
+    def in_scope(self, url: str) -> bool:
+        if self.scope == "any":
+            return True
+        parsed = urlparse(url)
+        if self.scope == "domain":
+            return parsed.netloc in self.allowed_hosts
+        host = parsed.hostname or ''
+        return any(host == site or host.endswith('.' + site) for site in self.allowed_sites)
+
+    def stop(self):
+        """Stop scheduling new pages; pages already in flight are still yielded"""
+        self._stopped.set()
+
+    def _fetch(self, url: str, depth: int) -> Tuple[Dict, List[str]]:
+        start = time.perf_counter()
+        result = {"url": url, "depth": depth}
+        try:
+            page = self.fetcher.fetch(url)
+            html_content = page["html"]
+            links = extract_links(html_content, url) if depth < self.max_depth else []
+            result.update(status="success", tier=page["tier"], fetch_time=page["elapsed"])
+            if self.include_html:
+                result["html"] = html_content
+            if self.include_text:
+                result["text"] = normalize_whitespace(extract_text(html_content))
+        except Exception as e:
+            links = []
+            result.update(status="failed", error=str(e))
+        result["elapsed"] = round(time.perf_counter() - start, 3)
+        return result, links
+
+    def _next_ready(self, in_flight: Dict[str, int]) -> Optional[Tuple[str, int]]:
+        """Pop the first frontier entry whose host is under its concurrency limit"""
+        for _ in range(len(self.frontier)):
+            url, depth = self.frontier.popleft()
+            if in_flight.get(urlparse(url).netloc, 0) < self.per_domain:
+                return url, depth
+            self.frontier.append((url, depth))
+        return None
+
+    def _enqueue(self, links: List[str], depth: int):
+        for url in links:
+            if len(self.visited) >= self.max_pages:
+                return
+            if url not in self.visited and self.in_scope(url):
+                self.visited.add(url)
+                self.frontier.append((url, depth))
+        self.stats["discovered"] = len(self.visited)
+
+    def run(self) -> Iterator[Dict]:
+        """
+        Crawl and yield one result per page as it finishes
+        Each result has url, depth, status, elapsed (seconds, including extraction),
+        and on success tier, fetch_time and text and/or html; on failure error.
+        """
+        start = time.perf_counter()
+        in_flight: Dict[str, int] = {}
+        running = {}
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            while True:
+                while len(running) < self.workers and not self._stopped.is_set():
+                    entry = self._next_ready(in_flight)
+                    if entry is None:
+                        break
+                    host = urlparse(entry[0]).netloc
+                    in_flight[host] = in_flight.get(host, 0) + 1
+                    running[executor.submit(self._fetch, *entry)] = entry
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, depth = running.pop(future)
+                    in_flight[urlparse(url).netloc] -= 1
+                    result, links = future.result()
+                    self.stats["fetched" if result["status"] == "success" else "failed"] += 1
+                    self._enqueue(links, depth + 1)
+                    yield result
+        finally:
+            self._stopped.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.stats["elapsed"] = round(time.perf_counter() - start, 3)
+
+
+def crawl(seeds: Iterable[str], **options) -> Iterator[Dict]:
+    """Shortcut for CrawlJob(seeds, **options).run()"""
+    return CrawlJob(seeds, **options).run()
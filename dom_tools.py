@@ -0,0 +1,108 @@
+from typing import List, Optional, Tuple
+
+# Collects one URL per matching element in a single round trip: the widest
+# srcset candidate, then data-src/data-iurl, then the current src. Only http(s)
+# URLs are kept, deduplicated in the page, as [url, width, height] triples.
+EXTRACT_IMAGES_SCRIPT = """
+const [selector, limit] = arguments;
+const seen = new Set();
+const out = [];
+const widest = (srcset) => {
+    let best = null, bestWidth = -1;
+    for (const part of (srcset || '').split(',')) {
+        const [url, descriptor] = part.trim().split(/\\s+/);
+        const width = parseFloat(descriptor) || 0;
+        if (url && width > bestWidth) { best = url; bestWidth = width; }
+    }
+    return best;
+};
+for (const el of document.querySelectorAll(selector)) {
+    const candidates = [
+        widest(el.getAttribute('srcset') || el.getAttribute('data-srcset')),
+        el.getAttribute('data-src'),
+        el.getAttribute('data-iurl'),
+        el.currentSrc || el.getAttribute('src')
+    ];
+    for (const raw of candidates) {
+        if (!raw) continue;
+        let url;
+        try { url = new URL(raw, document.baseURI).href; } catch (e) { continue; }
+        if (!url.startsWith('http')) continue;
+        if (!seen.has(url)) {
+            seen.add(url);
+            out.push([url, el.naturalWidth || 0, el.naturalHeight || 0]);
+        }
+        break;
+    }
+    if (limit && out.length >= limit) break;
+}
+return out;
+"""
+
+
+def extract_images(driver, selector: str, limit: Optional[int] = None) -> List[Tuple[str, int, int]]:
+    """Return deduplicated (url, natural_width, natural_height) for images matching selector"""
+    rows = driver.execute_script(EXTRACT_IMAGES_SCRIPT, selector, limit or 0) or []
+    return [(url, width, height) for url, width, height in rows]
+
+
+def extract_image_urls(driver, selector: str, limit: Optional[int] = None) -> List[str]:
+    """URLs only, in page order"""
+    return [url for url, _, _ in extract_images(driver, selector, limit)]
+
+
+# Async script: resolves as soon as more elements match the selector, or once
+# the DOM has been quiet for settleMs (nothing more is loading), or at timeoutMs.
+WAIT_FOR_GROWTH_SCRIPT = """
+const [selector, previousCount, timeoutMs, settleMs] = arguments;
+const done = arguments[arguments.length - 1];
+let finished = false, quietTimer = null, deadline = null, observer = null;
+const count = () => document.querySelectorAll(selector).length;
+const finish = () => {
+    if (finished) return;
+    finished = true;
+    if (observer) observer.disconnect();
+    clearTimeout(quietTimer);
+    clearTimeout(deadline);
+    done(count());
+};
+const armQuietTimer = () => {
+    clearTimeout(quietTimer);
+    quietTimer = setTimeout(finish, settleMs);
+};
+if (count() > previousCount) { finish(); return; }
+observer = new MutationObserver(() => {
+    if (count() > previousCount) { finish(); } else { armQuietTimer(); }
+});
+observer.observe(document.body, {childList: true, subtree: true, attributes: true});
+armQuietTimer();
+deadline = setTimeout(finish, timeoutMs);
+"""
+
+
+def count_elements(driver, selector: str) -> int:
+    return driver.execute_script("return document.querySelectorAll(arguments[0]).length", selector)
+
+
+def wait_for_growth(driver, selector: str, previous_count: int,
+                    timeout: float = 2.0, settle: float = 0.5) -> int:
+    """
+    Wait until more than previous_count elements match selector
+    Returns early when the page stops changing for `settle` seconds; `timeout`
+    is only an upper bound. Returns the current match count.
+    """
+    return driver.execute_async_script(
+        WAIT_FOR_GROWTH_SCRIPT, selector, previous_count, int(timeout * 1000), int(settle * 1000)
+    )
+
+
+def scroll_and_wait(driver, selector: str, timeout: float = 2.0, settle: float = 0.5,
+                    script: str = "window.scrollTo(0, document.body.scrollHeight);") -> Tuple[int, bool]:
+    """
+    Scroll, then wait for new matching elements
+    Returns: (match_count, grew)
+    """
+    before = count_elements(driver, selector)
+    driver.execute_script(script)
+    after = wait_for_growth(driver, selector, before, timeout, settle)
+    return after, after > before
@@ -0,0 +1,222 @@
+import hashlib
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/94.0.4606.71 Safari/537.36',
+    'Accept': 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Default size window for downloaded images: skip tracking pixels and runaway bodies
+MIN_IMAGE_BYTES = 1024
+MAX_IMAGE_BYTES = 25 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# handler(index, url, response) -> True if the image was stored
+Handler = Callable[[int, str, requests.Response], bool]
+
+# body_source(url) -> bytes already held elsewhere (e.g. the browser), or None
+BodySource = Callable[[str], Optional[bytes]]
+
+# progress(url, ok) is called as each URL finishes
+Progress = Callable[[str, bool], None]
+
+
+class BufferedResponse:
+    """Stand-in for a streamed 200 response whose body is already in memory"""
+
+    status_code = 200
+
+    def __init__(self, url: str, content: bytes):
+        self.url = url
+        self.content = content
+        self.headers = {'Content-Length': str(len(content))}
+
+    def iter_content(self, chunk_size: int = CHUNK_SIZE):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+
+def stream_to_temp(response: requests.Response, directory: str,
+                   max_bytes: Optional[int] = MAX_IMAGE_BYTES,
+                   min_bytes: int = MIN_IMAGE_BYTES,
+                   chunk_size: int = CHUNK_SIZE) -> Tuple[str, str, int]:
+    """
+    Stream a response body to a temp file in directory, hashing it on the way
+    Aborts early when Content-Length or the bytes read exceed max_bytes, and
+    rejects bodies smaller than min_bytes. The caller renames or removes the file.
+    Returns: (temp_path, sha256_hex, size)
+    """
+    length = response.headers.get('Content-Length', '')
+    if length.isdigit():
+        if max_bytes is not None and int(length) > max_bytes:
+            raise ValueError(f"Image too large: {length} bytes")
+        if int(length) < min_bytes:
+            raise ValueError(f"Image too small: {length} bytes")
+
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in response.iter_content(chunk_size):
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise ValueError(f"Image too large: over {max_bytes} bytes")
+                digest.update(chunk)
+                f.write(chunk)
+        if size < min_bytes:
+            raise ValueError(f"Image too small: {size} bytes")
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest(), size
+
+
+class DownloadEngine:
+    """Concurrent downloader with one keep-alive session and connection cap per host"""
+
+    def __init__(self, max_workers: int = 16, per_host_limit: int = 4, retries: int = 3,
+                 backoff: float = 0.5, timeout: float = 10, headers: Optional[Dict[str, str]] = None):
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.headers = dict(DEFAULT_HEADERS, **(headers or {}))
+        self._sessions: Dict[str, requests.Session] = {}
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _session_for(self, url: str) -> Tuple[requests.Session, threading.BoundedSemaphore]:
+        """Return the shared session and connection semaphore for the URL's host"""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.per_host_limit)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers.update(self.headers)
+                self._sessions[host] = session
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._sessions[host], self._host_slots[host]
+
+    def _retry_delay(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """Exponential backoff with jitter, honouring a numeric Retry-After header"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return min(float(retry_after), 30.0)
+        return self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    def _from_body_source(self, index: int, url: str, handler: Handler,
+                          body_source: BodySource) -> bool:
+        """Try to satisfy a URL from body_source; any miss or failure means use HTTP"""
+        try:
+            content = body_source(url)
+            return content is not None and bool(handler(index, url, BufferedResponse(url, content)))
+        except Exception:
+            return False
+
+    def fetch(self, index: int, url: str, handler: Handler,
+              body_source: Optional[BodySource] = None) -> Tuple[bool, Optional[str], str]:
+        """
+        Fetch a single URL and pass the streaming response to handler
+        Bytes from body_source are used when available, falling back to HTTP.
+        Returns: (success: bool, error_message: Optional[str], origin: "body_source" or "http")
+        """
+        if body_source is not None and self._from_body_source(index, url, handler, body_source):
+            return True, None, "body_source"
+        ok, error = self._fetch_http(index, url, handler)
+        return ok, error, "http"
+
+    def _fetch_http(self, index: int, url: str, handler: Handler) -> Tuple[bool, Optional[str]]:
+        session, slot = self._session_for(url)
+        error = None
+
+        for attempt in range(self.retries + 1):
+            delay = None
+            try:
+                with slot:
+                    with session.get(url, timeout=self.timeout, stream=True) as response:
+                        if response.status_code in RETRY_STATUSES:
+                            error = f"HTTP {response.status_code}"
+                            delay = self._retry_delay(attempt, response)
+                        elif response.status_code != 200:
+                            return False, f"HTTP {response.status_code}"
+                        else:
+                            try:
+                                if handler(index, url, response):
+                                    return True, None
+                                return False, "Rejected by handler"
+                            except Exception as e:
+                                return False, f"Processing failed: {str(e)}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = f"Download failed: {str(e)}"
+                delay = self._retry_delay(attempt)
+            except requests.RequestException as e:
+                return False, f"Download failed: {str(e)}"
+
+            # Back off outside the host slot so other workers can use the connection
+            if attempt < self.retries:
+                time.sleep(delay)
+
+        return False, error
+
+    def download(self, urls: Iterable[str], handler: Handler,
+                 body_source: Optional[BodySource] = None,
+                 progress: Optional[Progress] = None) -> Dict:
+        """
+        Download all URLs concurrently and return success/failure stats with per-URL timings
+        "reused" counts URLs served by body_source instead of the network.
+        """
+        stats = {"successful": 0, "failed": 0, "reused": 0, "timings": {}, "errors": {}}
+
+        def timed_fetch(index: int, url: str):
+            start = time.perf_counter()
+            ok, error, origin = self.fetch(index, url, handler, body_source)
+            return url, ok, error, origin, time.perf_counter() - start
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = [executor.submit(timed_fetch, idx, url) for idx, url in enumerate(urls)]
+            for future in as_completed(futures):
+                url, ok, error, origin, elapsed = future.result()
+                stats["timings"][url] = round(elapsed, 3)
+                if ok:
+                    stats["successful"] += 1
+                    if origin == "body_source":
+                        stats["reused"] += 1
+                else:
+                    stats["failed"] += 1
+                    stats["errors"][url] = error
+                if progress is not None:
+                    progress(url, ok)
+        finally:
+            # On an early exit (e.g. SystemExit from a cancelled job) drop queued downloads
+            executor.shutdown(cancel_futures=True)
+
+        return stats
+
+    def close(self):
+        """Close all pooled sessions"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._host_slots.clear()
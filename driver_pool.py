@@ -0,0 +1,257 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Set
+from urllib.parse import urlparse
+
+from browser_profiles import FULL, check_profile
+
+try:
+    import psutil
+except ImportError:  # RSS based recycling is skipped without psutil
+    psutil = None
+
+
+class DriverPool:
+    """
+    Pool of warm WebDriver instances.
+    Drivers are created lazily up to `size`, health-checked on lease, wiped of
+    cookies and storage on release, and recycled after `max_pages` leases or
+    once the browser process tree exceeds `max_rss_mb`.
+    """
+
+    def __init__(self, factory: Callable, size: int = 2, max_pages: int = 50,
+                 max_rss_mb: Optional[int] = 1500, lease_timeout: float = 120,
+                 profile: str = FULL):
+        self.factory = factory
+        # Browser profile the factory's drivers are started with
+        self.profile = check_profile(profile)
+        self.size = size
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.lease_timeout = lease_timeout
+        self._idle = deque()
+        self._pages: Dict[int, int] = {}
+        self._created = 0
+        # Guards _idle and _created; notified whenever a driver or a free slot appears
+        self._available = threading.Condition()
+        self._closed = False
+
+    def _create(self):
+        try:
+            driver = self.factory()
+        except Exception:
+            self._free_slot()
+            raise
+        self._pages[id(driver)] = 0
+        return driver
+
+    def _free_slot(self):
+        with self._available:
+            self._created -= 1
+            self._available.notify()
+
+    def _discard(self, driver):
+        """Quit a driver and free its slot"""
+        self._pages.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        self._free_slot()
+
+    def _acquire(self, timeout: float):
+        """Take an idle driver, or create one while under size; wait for either otherwise"""
+        deadline = time.monotonic() + timeout
+        with self._available:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Driver pool is closed")
+                if self._idle:
+                    return self._idle.popleft()
+                if self._created < self.size:
+                    self._created += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No WebDriver became available within {timeout} seconds")
+                self._available.wait(remaining)
+        return self._create()
+
+    def is_healthy(self, driver) -> bool:
+        """Check the browser still responds to commands"""
+        try:
+            return driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def rss_mb(self, driver) -> Optional[float]:
+        """Resident memory of the driver's process tree in MB, if measurable"""
+        if psutil is None:
+            return None
+        pid = getattr(driver, 'browser_pid', None)
+        if pid is None:
+            service = getattr(driver, 'service', None)
+            process = getattr(service, 'process', None)
+            pid = getattr(process, 'pid', None)
+        if pid is None:
+            return None
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+            total = 0
+            for process in processes:
+                try:
+                    total += process.memory_info().rss
+                except psutil.Error:
+                    continue
+            return total / (1024 * 1024)
+        except psutil.Error:
+            return None
+
+    def visited_origins(self, driver) -> Set[str]:
+        """http(s) origins of the pages and frames loaded since the last reset"""
+        urls = [driver.current_url]
+        try:
+            history = driver.execute_cdp_cmd('Page.getNavigationHistory', {})
+            urls += [entry['url'] for entry in history.get('entries', [])]
+            frames = [driver.execute_cdp_cmd('Page.getFrameTree', {})['frameTree']]
+            while frames:
+                node = frames.pop()
+                urls.append(node['frame'].get('url', ''))
+                frames += node.get('childFrames', [])
+        except Exception:
+            pass
+        origins = set()
+        for url in urls:
+            parsed = urlparse(url)
+            if parsed.scheme in ('http', 'https'):
+                origins.add(f"{parsed.scheme}://{parsed.netloc}")
+        return origins
+
+    def reset(self, driver):
+        """
+        Clear cookies and web storage so the next lease starts clean
+        Cookies are cleared browser-wide; storage for every origin a page, redirect
+        target or iframe loaded during the lease.
+        """
+        try:
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            for origin in self.visited_origins(driver):
+                driver.execute_cdp_cmd('Storage.clearDataForOrigin', {
+                    'origin': origin,
+                    'storageTypes': 'all'
+                })
+        except Exception:
+            # Not a Chromium driver; fall back to clearing the current page's site
+            driver.execute_script("try { localStorage.clear(); sessionStorage.clear(); } catch (e) {}")
+            driver.delete_all_cookies()
+        driver.get("about:blank")
+        try:
+            # Start the next lease with an empty history so only its own origins are cleared
+            driver.execute_cdp_cmd('Page.resetNavigationHistory', {})
+        except Exception:
+            pass
+        try:
+            # Drop buffered network events so they don't pile up across leases
+            driver.get_log("performance")
+        except Exception:
+            pass
+
+    def _should_recycle(self, driver) -> bool:
+        if self._pages.get(id(driver), 0) >= self.max_pages:
+            return True
+        if self.max_rss_mb is not None:
+            rss = self.rss_mb(driver)
+            if rss is not None and rss > self.max_rss_mb:
+                return True
+        return False
+
+    def _release(self, driver, broken: bool = False):
+        if self._closed or broken:
+            self._discard(driver)
+            return
+
+        self._pages[id(driver)] = self._pages.get(id(driver), 0) + 1
+        if self._should_recycle(driver):
+            self._discard(driver)
+            return
+
+        try:
+            self.reset(driver)
+        except Exception:
+            self._discard(driver)
+            return
+        with self._available:
+            self._idle.append(driver)
+            self._available.notify()
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None, profile: Optional[str] = None):
+        """
+        Borrow a healthy driver for the duration of the with-block
+        A profile, if given, must be the pool's own; use ProfilePools to mix profiles.
+        """
+        if profile is not None and profile != self.profile:
+            raise ValueError(f"Pool holds '{self.profile}' drivers, not '{profile}'; use ProfilePools")
+        if self._closed:
+            raise RuntimeError("Driver pool is closed")
+        timeout = self.lease_timeout if timeout is None else timeout
+
+        driver = self._acquire(timeout)
+        while not self.is_healthy(driver):
+            self._discard(driver)
+            driver = self._acquire(timeout)
+
+        broken = False
+        try:
+            yield driver
+        except Exception:
+            broken = not self.is_healthy(driver)
+            raise
+        finally:
+            self._release(driver, broken)
+
+    def close(self):
+        """Quit every idle driver; leased drivers are quit when returned"""
+        with self._available:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            # Wake waiters so they fail fast instead of waiting out their timeout
+            self._available.notify_all()
+        for driver in idle:
+            self._discard(driver)
+
+
+class ProfilePools:
+    """
+    One DriverPool per browser profile, created on first use.
+    factory(profile) builds a driver; pool_options are passed to each DriverPool.
+    lease() without a profile behaves like a plain DriverPool of full drivers.
+    """
+
+    def __init__(self, factory: Callable[[str], object], **pool_options):
+        self.factory = factory
+        self.pool_options = pool_options
+        self._pools: Dict[str, DriverPool] = {}
+        self._lock = threading.Lock()
+
+    def pool(self, profile: str = FULL) -> DriverPool:
+        check_profile(profile)
+        with self._lock:
+            if profile not in self._pools:
+                self._pools[profile] = DriverPool(lambda: self.factory(profile), profile=profile,
+                                                  **self.pool_options)
+            return self._pools[profile]
+
+    def lease(self, timeout: Optional[float] = None, profile: str = FULL):
+        """Borrow a driver started with the given profile"""
+        return self.pool(profile).lease(timeout)
+
+    def close(self):
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            pool.close()
@@ -0,0 +1,160 @@
+import os
+import re
+import time
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+from browser_profiles import FULL
+from downloader import DEFAULT_HEADERS
+from services.api_cache import TTLCache
+
+DOMAIN_TIERS_PATH = os.getenv("DOMAIN_TIERS_PATH", os.path.join("cache", "domain_tiers.sqlite3"))
+
+PAGE_HEADERS = dict(DEFAULT_HEADERS, Accept='text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8')
+
+# Visible text below this means the initial HTML is only a shell
+MIN_TEXT_CHARS = 200
+# A framework mount point with less text than this has not been server-rendered
+ROOT_TEXT_CHARS = 1000
+
+FRAMEWORK_ROOT_PATTERN = re.compile(
+    r'<div[^>]+id=["\'](?:root|app|__next|__nuxt|svelte)["\'][^>]*>\s*</div>'
+    r'|\bng-version=|\bdata-reactroot\b|<app-root', re.I
+)
+NOSCRIPT_WARNING_PATTERN = re.compile(
+    r'<noscript[^>]*>(?:(?!</noscript>).)*?(?:enable|requires?|turn on|need)\s+javascript', re.I | re.S
+)
+INVISIBLE_PATTERN = re.compile(r'<(script|style|noscript|template)\b.*?</\1\s*>', re.I | re.S)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+# Start of a document that is HTML whatever its Content-Type says
+HTML_START_PATTERN = re.compile(r'\s*(?:<\?xml[^>]*>\s*)?(?:<!--.*?-->\s*)*<(?:!doctype\s+html|html|head|body)\b', re.I | re.S)
+
+HTTP = "http"
+BROWSER = "browser"
+
+# Statuses that mean the site refuses plain clients, so a browser is needed
+BLOCKED_STATUSES = (401, 403)
+# Statuses that mean the page itself is gone, whatever the tier
+GONE_STATUSES = (404, 410)
+
+
+class FetchError(Exception):
+    """The page can't be scraped by any tier because it is gone"""
+
+
+def visible_text_length(html: str) -> int:
+    """Rough count of visible characters, cheap enough to run on every response"""
+    body_start = html.lower().find('<body')
+    body = html[body_start:] if body_start >= 0 else html
+    text = TAG_PATTERN.sub(' ', INVISIBLE_PATTERN.sub(' ', body))
+    return len(''.join(text.split()))
+
+
+def needs_browser(html: str) -> Tuple[bool, Optional[str]]:
+    """
+    Decide whether HTML from a plain GET is rendered client-side
+    Returns: (needs_browser: bool, reason: Optional[str])
+    """
+    text_chars = visible_text_length(html)
+    if text_chars < MIN_TEXT_CHARS:
+        return True, "empty body text"
+    if NOSCRIPT_WARNING_PATTERN.search(html) and text_chars < ROOT_TEXT_CHARS:
+        return True, "noscript warning"
+    if FRAMEWORK_ROOT_PATTERN.search(html) and text_chars < ROOT_TEXT_CHARS:
+        return True, "framework root node"
+    return False, None
+
+
+class TieredFetcher:
+    """
+    Fetches pages over pooled HTTP first and escalates to a browser only when
+    the response looks JS-rendered, blocked or failed.
+    The tier that worked is remembered per domain for `ttl` seconds, so domains
+    known to need a browser skip the HTTP attempt.
+    """
+
+    def __init__(self, pool_for: Callable, timeout: float = 10,
+                 tiers: Optional[TTLCache] = None, ttl: float = 7 * 86400, pool_size: int = 16):
+        # pool_for(profile) -> DriverPool, e.g. scrape.get_driver_pool
+        self.pool_for = pool_for
+        self.timeout = timeout
+        self.tiers = tiers or TTLCache(DOMAIN_TIERS_PATH, ttl=ttl, stale_ttl=0, max_entries=20000)
+        self.session = requests.Session()
+        self.session.headers.update(PAGE_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def known_tier(self, url: str) -> Optional[str]:
+        tier, state = self.tiers.get(urlparse(url).netloc)
+        return tier if state == "fresh" else None
+
+    def learn(self, url: str, tier: str):
+        self.tiers.set(urlparse(url).netloc, tier)
+
+    def fetch_http(self, url: str) -> Tuple[Optional[str], Optional[str], bool]:
+        """
+        Plain GET
+        Returns: (html or None, reason for escalating or None, site needs a browser: bool)
+        Only JS-rendered or blocked responses say the site needs a browser; timeouts,
+        429, 5xx and bodies that aren't HTML escalate this request alone.
+        Raises FetchError on 404/410.
+        """
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+        except requests.RequestException as e:
+            return None, f"request failed: {str(e)}", False
+        if response.status_code in GONE_STATUSES:
+            raise FetchError(f"HTTP {response.status_code} for {url}")
+        if response.status_code >= 400:
+            return None, f"HTTP {response.status_code}", response.status_code in BLOCKED_STATUSES
+        content_type = response.headers.get('content-type', '')
+        if 'charset' in content_type.lower():
+            html = response.text
+        else:
+            html = response.content.decode('utf-8', errors='replace')
+        # Servers that omit the header or send text/plain may still serve HTML
+        if 'html' not in content_type.lower() and not HTML_START_PATTERN.match(html[:1024]):
+            return None, f"unexpected content type '{content_type}'", False
+        escalate, reason = needs_browser(html)
+        return (None, reason, True) if escalate else (html, None, False)
+
+    def fetch_browser(self, url: str, pool=None, profile: str = FULL) -> str:
+        pool = pool or self.pool_for(profile)
+        with pool.lease() as driver:
+            driver.get(url)
+            WebDriverWait(driver, self.timeout).until(
+                EC.presence_of_element_located((By.TAG_NAME, "body"))
+            )
+            return driver.page_source
+
+    def fetch(self, url: str, pool=None, profile: str = FULL) -> Dict:
+        """
+        Fetch a page through the cheapest tier that yields real content
+        Returns: {"url", "html", "tier", "reason", "elapsed"}; FetchError (page gone)
+        and browser errors propagate.
+        """
+        start = time.perf_counter()
+        reason, site_needs_browser = "learned", False
+        known = self.known_tier(url)
+        if known != BROWSER:
+            html, reason, site_needs_browser = self.fetch_http(url)
+            if html is not None:
+                if known != HTTP:
+                    self.learn(url, HTTP)
+                return {"url": url, "html": html, "tier": HTTP, "reason": None,
+                        "elapsed": round(time.perf_counter() - start, 3)}
+
+        html = self.fetch_browser(url, pool, profile)
+        # A timeout or 5xx says nothing about the site, so keep trying HTTP next time;
+        # a learned tier isn't refreshed, so HTTP is retried once it expires
+        if site_needs_browser:
+            self.learn(url, BROWSER)
+        return {"url": url, "html": html, "tier": BROWSER, "reason": reason,
+                "elapsed": round(time.perf_counter() - start, 3)}
@@ -1,31 +1,81 @@
 import requests
 import os
 from dotenv import load_dotenv
-from typing import Set, Dict, Tuple
+from requests.adapters import HTTPAdapter
+from typing import List, Optional, Set, Dict, Tuple
+from services.api_cache import TTLCache, cache_key, get_default_cache
+from services.pagination import PROVIDER_PAGING, fetch_pages, page_size_for
 
 load_dotenv()
 
+# Per-page request timeout, in seconds
+REQUEST_TIMEOUT = 10.0
+
 class APIImageScraper:
-    def __init__(self):
+    def __init__(self, cache: Optional[TTLCache] = None, timeout: float = REQUEST_TIMEOUT):
         self.unsplash_key = os.getenv('UNSPLASH_ACCESS_KEY')
         self.pexels_key = os.getenv('PEXELS_API_KEY')
         self.unsplash_url = os.getenv('UNSPLASH_API_URL', 'https://api.unsplash.com/search/photos')
         self.pexels_url = os.getenv('PEXELS_API_URL', 'https://api.pexels.com/v1/search')
+        self.cache = cache or get_default_cache()
+        self.timeout = timeout
+
+        # One pooled session shared by every page request
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=8)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _paginate(self, provider: str, fetch_page, query: str, max_images: int) -> List[str]:
+        """Fetch enough pages for max_images concurrently within the provider's limits"""
+        paging = PROVIDER_PAGING[provider]
+        per_page = page_size_for(provider, max_images)
+        return fetch_pages(
+            lambda page: fetch_page(query, page, per_page),
+            max_images,
+            per_page,
+            max_pages=paging['max_pages'],
+            concurrency=paging['concurrency']
+        )
+
+    def _fetch_unsplash(self, query: str, max_images: int) -> List[str]:
+        return self._paginate('unsplash', self._fetch_unsplash_page, query, max_images)
+
+    def _fetch_pexels(self, query: str, max_images: int) -> List[str]:
+        return self._paginate('pexels', self._fetch_pexels_page, query, max_images)
+
+    def _fetch_unsplash_page(self, query: str, page: int, per_page: int) -> List[str]:
+        headers = {"Authorization": f"Client-ID {self.unsplash_key}"}
+        response = self.session.get(self.unsplash_url, headers=headers, params={
+            "query": query,
+            "per_page": per_page,
+            "page": page
+        }, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        return [photo["urls"]["regular"] for photo in data.get("results", [])]
+
+    def _fetch_pexels_page(self, query: str, page: int, per_page: int) -> List[str]:
+        headers = {"Authorization": self.pexels_key}
+        response = self.session.get(self.pexels_url, headers=headers, params={
+            "query": query,
+            "per_page": per_page,
+            "page": page
+        }, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        return [photo["src"]["large"] for photo in data.get("photos", [])]
 
     def scrape_unsplash(self, query: str, max_images: int = 6) -> Tuple[Set[str], Dict]:
         if not self.unsplash_key:
             return set(), {"error": "Unsplash API key not configured"}
         
-        headers = {"Authorization": f"Client-ID {self.unsplash_key}"}
         try:
-            response = requests.get(self.unsplash_url, headers=headers, params={
-                "query": query,
-                "per_page": max_images,
-                "page": 1
-            })
-            response.raise_for_status()
-            data = response.json()
-            return {photo["urls"]["regular"] for photo in data.get("results", [])}, {}
+            urls, _ = self.cache.get_or_fetch(
+                cache_key("unsplash", query, max_images),
+                lambda: self._fetch_unsplash(query, max_images)
+            )
+            return set(urls), {}
         except Exception as e:
             return set(), {"error": f"Unsplash API error: {str(e)}"}
 
@@ -33,15 +83,11 @@ class APIImageScraper:
         if not self.pexels_key:
             return set(), {"error": "Pexels API key not configured"}
         
-        headers = {"Authorization": self.pexels_key}
         try:
-            response = requests.get(self.pexels_url, headers=headers, params={
-                "query": query,
-                "per_page": max_images,
-                "page": 1
-            })
-            response.raise_for_status()
-            data = response.json()
-            return {photo["src"]["large"] for photo in data.get("photos", [])}, {}
+            urls, _ = self.cache.get_or_fetch(
+                cache_key("pexels", query, max_images),
+                lambda: self._fetch_pexels(query, max_images)
+            )
+            return set(urls), {}
         except Exception as e:
             return set(), {"error": f"Pexels API error: {str(e)}"}
@@ -2,51 +2,155 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.common.by import By
 import random
-import time
 import os
 import requests
-import io
-from PIL import Image
+from contextlib import contextmanager
+from downloader import stream_to_temp, MAX_IMAGE_BYTES, MIN_IMAGE_BYTES
+from services.image_format import prepare_image_file
+from services.url_validator import get_default_validator
+from dom_tools import extract_image_urls, scroll_and_wait
+from browser_network import NetworkRecorder, THUMBNAIL_HOSTS, extract_embedded_image_urls
+from browser_profiles import FULL
 from utils import get_undetected_driver
 
+# Consecutive passes without new URLs before a scraper gives up; each pass
+# waits at least the caller's delay for lazy-loaded results
+MAX_STALLED_PASSES = 3
+
+# Network-harvested images smaller than this are icons or thumbnails
+HARVEST_MIN_BYTES = 20 * 1024
+
+# Full-resolution preview shown after clicking a Google thumbnail
+GOOGLE_PREVIEW_SELECTOR = "img.n3VNCb, img.r48jcc, img.iPVvYb"
+
 class ImageScraper:
-    def __init__(self):
-        self.driver = get_undetected_driver()
+    def __init__(self, driver_pool=None, network_logging=False):
+        # With a pool, each scrape() borrows a warm driver instead of owning one
+        self.driver_pool = driver_pool
+        self.driver = None if driver_pool else get_undetected_driver(network_logging=network_logging)
         
     def __del__(self):
-        if hasattr(self, 'driver'):
+        if getattr(self, 'driver_pool', None) is None and getattr(self, 'driver', None) is not None:
             self.driver.quit()
+
+    @contextmanager
+    def browser(self, profile=None):
+        """
+        Provide self.driver, leasing one from the pool when configured
+        Selecting a profile (e.g. "harvest") needs a ProfilePools pool; the owned
+        driver is always a full one.
+        """
+        if self.driver_pool is None:
+            if profile is not None and profile != FULL:
+                raise ValueError(f"Scraper owns a '{FULL}' driver, not '{profile}'; pass a ProfilePools pool")
+            yield self.driver
+            return
+        lease = self.driver_pool.lease(profile=profile) if profile else self.driver_pool.lease()
+        with lease as driver:
+            self.driver = driver
+            try:
+                yield driver
+            finally:
+                self.driver = None
         
-    def scroll_down(self, delay=1):
-        self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(delay)
+    def scroll_down(self, delay=1, selector="img"):
+        """
+        Scroll to the bottom and wait for new matching elements
+        Returns as soon as some appear; otherwise waits the full delay, so slow
+        XHR-driven pages aren't taken as exhausted after a short quiet spell.
+        """
+        _, grew = scroll_and_wait(self.driver, selector, timeout=delay, settle=delay)
+        return grew
 
-    def download_image(self, download_path, url, file_name):
+    def download_image(self, download_path, url, file_name, target_format=None,
+                       max_bytes=MAX_IMAGE_BYTES, min_bytes=MIN_IMAGE_BYTES):
+        """Stream the original image bytes to disk; re-encode only when target_format is given"""
         try:
             os.makedirs(download_path, exist_ok=True)
-            image_content = requests.get(url).content
-            image_file = io.BytesIO(image_content)
-            image = Image.open(image_file)
-            file_path = os.path.join(download_path, file_name)
-            
-            with open(file_path, "wb") as f:
-                image.save(f, "JPEG")
+            with requests.get(url, stream=True, timeout=10) as response:
+                response.raise_for_status()
+                tmp_path, _, _ = stream_to_temp(response, download_path, max_bytes, min_bytes)
+            try:
+                ext = prepare_image_file(tmp_path, target_format)
+                file_path = os.path.join(download_path, f"{os.path.splitext(file_name)[0]}.{ext}")
+                os.replace(tmp_path, file_path)
+            except Exception:
+                os.remove(tmp_path)
+                raise
             return True
         except Exception as e:
             print(f'Failed to download image: {e}')
             return False
 
 class GoogleImageScraper(ImageScraper):
-    def scrape(self, search_query, max_images=6, delay=2):
+    def __init__(self, driver_pool=None, validator=None):
+        # mode="network" reads the performance log of an owned driver
+        super().__init__(driver_pool, network_logging=True)
+        self.validator = validator or get_default_validator()
+
+    def scrape(self, search_query, max_images=6, delay=2, mode="click", profile=None):
+        """
+        mode="click" opens every thumbnail to read the full-size src.
+        mode="network" harvests full-size URLs from embedded page JSON and the
+        browser's network activity while scrolling, without clicking; it pairs
+        with profile="harvest", which stops the browser loading images at all.
+        """
+        with self.browser(profile):
+            if mode == "network":
+                return self._harvest(search_query, max_images, delay)
+            return self._scrape(search_query, max_images, delay)
+
+    def _harvest(self, search_query, max_images, delay, max_scrolls=8):
+        image_urls = []
+        try:
+            search_query = search_query.replace(' ', '+')
+            self.driver.get(f"https://www.google.com/search?q={search_query}&tbm=isch")
+            recorder = NetworkRecorder(self.driver)
+            
+            seen = set()
+            backlog = []
+            stalled = 0
+            for _ in range(max_scrolls):
+                # Initial results are inlined in the page; later ones arrive by XHR
+                recorder.poll()
+                sources = [self.driver.page_source] + recorder.drain_data_bodies()
+                candidates = [
+                    url for source in sources
+                    for url, _, _ in extract_embedded_image_urls(source)
+                ]
+                # Full-size images the page itself loaded
+                candidates += recorder.image_urls(min_bytes=HARVEST_MIN_BYTES, include_thumbnails=False)
+                candidates = [url for url in dict.fromkeys(candidates) if url not in seen]
+                seen.update(candidates)
+                backlog += candidates
+                
+                # Validate enough for the remaining slots, with headroom for rejects;
+                # the rest waits for the next pass
+                batch_size = 2 * (max_images - len(image_urls))
+                batch, backlog = backlog[:batch_size], backlog[batch_size:]
+                image_urls += self.validate_candidates(batch, max_images - len(image_urls))
+                if len(image_urls) >= max_images:
+                    break
+                
+                _, grew = scroll_and_wait(self.driver, "img", timeout=delay, settle=delay)
+                stalled = 0 if grew or candidates or backlog else stalled + 1
+                if stalled >= MAX_STALLED_PASSES:
+                    break
+            
+            return image_urls
+            
+        except Exception as e:
+            print(f"Error in Google harvester: {str(e)}")
+            return image_urls
+
+    def _scrape(self, search_query, max_images, delay):
+        image_urls = set()
         try:
             search_query = search_query.replace(' ', '+')
             search_url = f"https://www.google.com/search?q={search_query}&tbm=isch"
             
             print(f"Accessing URL: {search_url}")
             self.driver.get(search_url)
-            time.sleep(delay)
-            
-            image_urls = set()
             
             WebDriverWait(self.driver, 20).until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, "img.rg_i"))
@@ -54,38 +158,35 @@ class GoogleImageScraper(ImageScraper):
             
             scroll_attempts = 0
             max_scrolls = 8
+            seen = set()
             
             while len(image_urls) < max_images and scroll_attempts < max_scrolls:
-                # Scroll and wait
-                self.driver.execute_script("window.scrollBy(0, 1000);")
-                time.sleep(delay)
+                # Scroll and wait for more thumbnails, at most delay seconds
+                scroll_and_wait(self.driver, "img.rg_i", timeout=delay,
+                                script="window.scrollBy(0, 1000);")
                 
                 # Find all image elements
                 elements = self.driver.find_elements(By.CSS_SELECTOR, "img.rg_i")
+                candidates = []
                 
                 for element in elements:
+                    # Collect enough candidates for the remaining slots, with headroom for rejects
+                    if len(candidates) >= 2 * (max_images - len(image_urls)):
+                        break
                     try:
-                        # Click on the image to get the full resolution version
+                        # Click on the image and wait, at most delay seconds, for the full resolution version
+                        previous = self.preview_sources()
                         element.click()
-                        time.sleep(delay)
-                        
-                        # Try to get the full-resolution image
-                        actual_images = self.driver.find_elements(
-                            By.CSS_SELECTOR, 
-                            "img.n3VNCb, img.r48jcc, img.iPVvYb"
-                        )
                         
-                        for img in actual_images:
-                            src = img.get_attribute('src')
-                            if src and src.startswith('http') and src not in image_urls:
-                                if self.is_valid_image(src):
-                                    image_urls.add(src)
-                                    print(f"Found image: {src}")
-                                    if len(image_urls) >= max_images:
-                                        return list(image_urls)
+                        for src in self.wait_for_preview(delay, previous):
+                            if src not in seen:
+                                seen.add(src)
+                                candidates.append(src)
                     except:
                         continue
                 
+                # Validate the whole batch concurrently instead of one HEAD per click
+                image_urls.update(self.validate_candidates(candidates, max_images - len(image_urls)))
                 scroll_attempts += 1
             
             return list(image_urls)
@@ -94,64 +195,104 @@ class GoogleImageScraper(ImageScraper):
             print(f"Error in Google scraper: {str(e)}")
             return list(image_urls)
 
-    def is_valid_image(self, url):
+    def preview_sources(self):
+        return [img.get_attribute('src') or '' for img in
+                self.driver.find_elements(By.CSS_SELECTOR, GOOGLE_PREVIEW_SELECTOR)]
+
+    def wait_for_preview(self, timeout, previous=()):
+        """
+        Return full-resolution preview srcs as soon as one differs from previous,
+        ignoring thumbnail hosts; whatever qualifies after timeout otherwise
+        """
+        previous = set(previous)
+        def full_size(driver):
+            return [src for src in self.preview_sources()
+                    if src.startswith('http') and src not in previous
+                    and not src.startswith(THUMBNAIL_HOSTS, src.find('//') + 2)]
+        
         try:
-            response = requests.head(url, timeout=5)
-            content_type = response.headers.get('content-type', '')
-            return ('image' in content_type.lower() and 
-                    not url.endswith(('.svg', '.gif')) and 
-                    'data:image' not in url)
-        except:
-            return False
+            return WebDriverWait(self.driver, timeout, poll_frequency=0.1).until(full_size)
+        except Exception:
+            try:
+                return full_size(self.driver)
+            except Exception:
+                return []
+
+    def validate_candidates(self, candidates, limit):
+        """Return up to limit valid image URLs from candidates, in order"""
+        verdicts = self.validator.validate(candidates)
+        valid = [url for url in candidates if verdicts.get(url)][:limit]
+        for url in valid:
+            print(f"Found image: {url}")
+        return valid
+
+    def is_valid_image(self, url):
+        return self.validator.validate([url]).get(url, False)
 
 class GettyImageScraper(ImageScraper):
-    def scrape(self, search_query, max_images=6, delay=1):
+    def scrape(self, search_query, max_images=6, delay=1, profile=None):
+        with self.browser(profile):
+            return self._scrape(search_query, max_images, delay)
+
+    def _scrape(self, search_query, max_images, delay):
         search_url = f"https://www.gettyimages.com/search/2/image?phrase={search_query}"
         self.driver.get(search_url)
         
         image_urls = set()
-        while len(image_urls) < max_images:
-            self.scroll_down(delay)
+        stalled = 0
+        while len(image_urls) < max_images and stalled < MAX_STALLED_PASSES:
+            self.scroll_down(delay, "article img.gallery-asset__thumb")
+            found_before = len(image_urls)
             
             try:
-                images = WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_all_elements_located((By.CSS_SELECTOR, "article img.gallery-asset__thumb"))
+                WebDriverWait(self.driver, 10).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, "article img.gallery-asset__thumb"))
                 )
                 
-                for img in images:
+                # One execute_script call for every thumbnail on the page
+                for src in extract_image_urls(self.driver, "article img.gallery-asset__thumb"):
                     if len(image_urls) >= max_images:
                         break
-                    src = img.get_attribute('src')
-                    if src and src.startswith('http'):
-                        image_urls.add(src)
+                    image_urls.add(src)
             except Exception as e:
                 print(f"Error finding images: {e}")
                 break
+            
+            # Stop when the page has run out of new results
+            stalled = stalled + 1 if len(image_urls) == found_before else 0
                 
         return image_urls
 
 class ShutterstockScraper(ImageScraper):
-    def scrape(self, search_query, max_images=6, delay=1):
+    def scrape(self, search_query, max_images=6, delay=1, profile=None):
+        with self.browser(profile):
+            return self._scrape(search_query, max_images, delay)
+
+    def _scrape(self, search_query, max_images, delay):
         search_url = f"https://www.shutterstock.com/search/{search_query}"
         self.driver.get(search_url)
         
         image_urls = set()
-        while len(image_urls) < max_images:
-            self.scroll_down(delay)
+        stalled = 0
+        while len(image_urls) < max_images and stalled < MAX_STALLED_PASSES:
+            self.scroll_down(delay, "img.z_h_9d80b")
+            found_before = len(image_urls)
             
             try:
-                images = WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_all_elements_located((By.CSS_SELECTOR, "img.z_h_9d80b"))
+                WebDriverWait(self.driver, 10).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, "img.z_h_9d80b"))
                 )
                 
-                for img in images:
+                # One execute_script call for every thumbnail on the page
+                for src in extract_image_urls(self.driver, "img.z_h_9d80b"):
                     if len(image_urls) >= max_images:
                         break
-                    src = img.get_attribute('src')
-                    if src and src.startswith('http'):
-                        image_urls.add(src)
+                    image_urls.add(src)
             except Exception as e:
                 print(f"Error finding images: {e}")
                 break
+            
+            # Stop when the page has run out of new results
+            stalled = stalled + 1 if len(image_urls) == found_before else 0
                 
         return image_urls
\ No newline at end of file
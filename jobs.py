@@ -0,0 +1,238 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join("cache", "jobs"))
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "2"))
+# Finished job files kept on disk
+MAX_JOB_HISTORY = 200
+# Time a terminated worker gets to quit its browsers before it is killed
+STOP_TIMEOUT = 15
+KILL_TIMEOUT = 5
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+INTERRUPTED = "interrupted"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED, INTERRUPTED)
+
+COUNTERS = ("found", "downloaded", "failed")
+
+
+def job_path(jobs_dir: str, job_id: str) -> str:
+    return os.path.join(jobs_dir, f"{job_id}.json")
+
+
+def read_job(jobs_dir: str, job_id: str) -> Optional[Dict]:
+    try:
+        with open(job_path(jobs_dir, job_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_job(jobs_dir: str, job: Dict):
+    """Replace the job file atomically so readers never see a partial write"""
+    fd, tmp_path = tempfile.mkstemp(dir=jobs_dir, suffix=".tmp")
+    with os.fdopen(fd, 'w') as f:
+        json.dump(job, f)
+    os.replace(tmp_path, job_path(jobs_dir, job["id"]))
+
+
+class JobProgress:
+    """
+    Progress reporter used inside a worker process.
+    Every update is written to the job file, where the UI polls it.
+    """
+
+    def __init__(self, jobs_dir: str, job_id: str):
+        self.jobs_dir = jobs_dir
+        self.job = read_job(jobs_dir, job_id)
+        if self.job is None:
+            raise ValueError(f"Unknown job {job_id}")
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        with self._lock:
+            self.job.update(fields)
+            write_job(self.jobs_dir, self.job)
+
+    def source(self, source: str, **fields):
+        """Set per-source fields such as status or error"""
+        with self._lock:
+            self.job["sources"][source].update(fields)
+            write_job(self.jobs_dir, self.job)
+
+    def add(self, source: str, **counts):
+        """Increment found/downloaded/failed for a source and the job totals"""
+        with self._lock:
+            for key, value in counts.items():
+                self.job["sources"][source][key] = self.job["sources"][source].get(key, 0) + value
+                self.job["progress"][key] = self.job["progress"].get(key, 0) + value
+            write_job(self.jobs_dir, self.job)
+
+
+class JobManager:
+    """
+    Runs jobs in separate worker processes, at most `max_concurrent` at once.
+    target(job_id, jobs_dir) runs in a spawned process and reports through
+    JobProgress. Job state lives in JSON files under jobs_dir, so it survives
+    page refreshes; jobs still queued when the server stopped are picked up again.
+    """
+
+    def __init__(self, target: Callable[[str, str], None], jobs_dir: str = JOBS_DIR,
+                 max_concurrent: int = MAX_CONCURRENT_JOBS, poll_interval: float = 0.5):
+        self.target = target
+        self.jobs_dir = jobs_dir
+        self.max_concurrent = max_concurrent
+        self.poll_interval = poll_interval
+        # spawn gives workers a clean interpreter: no inherited threads, locks or drivers
+        self._context = multiprocessing.get_context("spawn")
+        self._queue = deque()
+        self._running: Dict[str, multiprocessing.Process] = {}
+        # Workers being stopped, with the status their job gets once they exit
+        self._stopping: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+        os.makedirs(jobs_dir, exist_ok=True)
+        self._recover()
+        self._monitor = threading.Thread(target=self._run_monitor, daemon=True)
+        self._monitor.start()
+
+    def _recover(self):
+        """Requeue jobs left queued by a previous server; running ones lost their process"""
+        jobs = self.list_jobs(limit=None)
+        for job in reversed(jobs):
+            if job["status"] == QUEUED:
+                self._queue.append(job["id"])
+            elif job["status"] == RUNNING:
+                job.update(status=INTERRUPTED, finished=time.time())
+                write_job(self.jobs_dir, job)
+        for job in [job for job in jobs if job["status"] in FINISHED][MAX_JOB_HISTORY:]:
+            try:
+                os.remove(job_path(self.jobs_dir, job["id"]))
+            except OSError:
+                pass
+
+    def submit(self, query: str, sources: List[str], count: int) -> str:
+        """Queue a scrape job and return its id"""
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "id": job_id,
+            "query": query,
+            "sources": {source: {"status": QUEUED} for source in sources},
+            "count": count,
+            "status": QUEUED,
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "progress": {key: 0 for key in COUNTERS},
+        }
+        write_job(self.jobs_dir, job)
+        with self._lock:
+            self._queue.append(job_id)
+            self._fill()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return read_job(self.jobs_dir, job_id)
+
+    def list_jobs(self, limit: Optional[int] = 20) -> List[Dict]:
+        """Jobs newest first"""
+        jobs = []
+        for name in os.listdir(self.jobs_dir):
+            if name.endswith(".json"):
+                job = read_job(self.jobs_dir, name[:-5])
+                if job is not None:
+                    jobs.append(job)
+        jobs.sort(key=lambda job: job["created"], reverse=True)
+        return jobs if limit is None else jobs[:limit]
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a queued job or stop a running one"""
+        with self._lock:
+            if job_id in self._queue:
+                self._queue.remove(job_id)
+                job = read_job(self.jobs_dir, job_id)
+                if job is not None:
+                    job.update(status=CANCELLED, finished=time.time())
+                    write_job(self.jobs_dir, job)
+                return True
+            if job_id not in self._running or job_id in self._stopping:
+                return False
+            process = self._running[job_id]
+            self._stopping[job_id] = CANCELLED
+            process.terminate()
+        # The worker keeps its slot until it has exited, so the cap still holds
+        self._wait_for_exit(process)
+        with self._lock:
+            self._reap()
+            self._fill()
+        return True
+
+    def _wait_for_exit(self, process: multiprocessing.Process):
+        """Give a terminated worker time to clean up, then kill it (called without the lock)"""
+        process.join(STOP_TIMEOUT)
+        if process.is_alive():
+            process.kill()
+            process.join(KILL_TIMEOUT)
+
+    def _start(self, job_id: str):
+        process = self._context.Process(target=self.target, args=(job_id, self.jobs_dir),
+                                        name=f"job-{job_id}", daemon=True)
+        process.start()
+        self._running[job_id] = process
+
+    def _fill(self):
+        """Start queued jobs while under the concurrency cap (caller holds the lock)"""
+        while self._queue and len(self._running) < self.max_concurrent:
+            self._start(self._queue.popleft())
+
+    def _reap(self):
+        """
+        Collect exited workers; a stopped worker's job gets the status it was stopped
+        with, and one that died without reporting is marked failed
+        """
+        for job_id, process in list(self._running.items()):
+            if process.is_alive():
+                continue
+            process.join()
+            del self._running[job_id]
+            stopped_status = self._stopping.pop(job_id, None)
+            job = read_job(self.jobs_dir, job_id)
+            if job is None or job["status"] in FINISHED:
+                continue
+            if stopped_status is not None:
+                job.update(status=stopped_status, finished=time.time())
+            else:
+                job.update(status=FAILED, finished=time.time(),
+                           error=f"Worker exited with code {process.exitcode}")
+            write_job(self.jobs_dir, job)
+
+    def _run_monitor(self):
+        while not self._closed.wait(self.poll_interval):
+            with self._lock:
+                self._reap()
+                self._fill()
+
+    def close(self):
+        """Stop running workers; their jobs are marked interrupted"""
+        self._closed.set()
+        with self._lock:
+            processes = list(self._running.values())
+            for job_id, process in self._running.items():
+                self._stopping.setdefault(job_id, INTERRUPTED)
+                process.terminate()
+        for process in processes:
+            self._wait_for_exit(process)
+        with self._lock:
+            self._reap()
@@ -1,54 +1,145 @@
 import streamlit as st
+import atexit
 import os
 from dotenv import load_dotenv
-from seleniumMASS.scraper import ImageScraper
+from jobs import JobManager, FINISHED
+from parse import start_warm_up
+from scrape_worker import SOURCES, run_job
 from services.image_service import ImageService
+from services.thumbnails import ThumbnailCache, IMAGE_EXTENSIONS
 
 # Load environment variables
 load_dotenv()
 
+# Shared, process-wide resources. Streamlit reruns this script on every
+# interaction, so everything expensive is created once and closed at exit.
+@st.cache_resource
+def get_image_service() -> ImageService:
+    return ImageService()
+
+@st.cache_resource
+def get_job_manager() -> JobManager:
+    # Scraping runs in worker processes (capped by MAX_CONCURRENT_JOBS), so a
+    # long job never blocks this script and survives page refreshes
+    manager = JobManager(run_job)
+    atexit.register(manager.close)
+    return manager
+
+@st.cache_resource
+def warm_up_model():
+    # Load the analysis model once per server, in the background, so the first
+    # analysis doesn't pay for it
+    return start_warm_up()
+
 def main():
     st.title("Image Scraper Application")
     
     # Initialize services
-    image_service = ImageService()
-    scraper = ImageScraper(headless=True)
+    get_image_service()
+    jobs = get_job_manager()
+    warm_up_model()
     
     # Sidebar for configuration
     with st.sidebar:
         st.header("Configuration")
         search_query = st.text_input("Search Query")
-        source = st.selectbox(
-            "Image Source",
-            ["google", "getty", "shutterstock", "unsplash", "pexels"]
-        )
+        sources = st.multiselect("Image Sources", SOURCES, default=["google"])
         num_images = st.number_input("Number of Images", min_value=1, max_value=100, value=10)
         
     # Main content area
     if st.button("Start Scraping"):
         if not search_query:
             st.error("Please enter a search query")
-            return
-            
-        try:
-            with st.spinner(f"Scraping {num_images} images from {source}..."):
-                # Here you would implement the actual scraping logic
-                st.info("Scraping functionality to be implemented")
-                
-        except Exception as e:
-            st.error(f"An error occurred: {str(e)}")
+        elif not sources:
+            st.error("Please select at least one source")
+        else:
+            jobs.submit(search_query, sources, int(num_images))
+            st.success(f"Queued {num_images} images per source from {', '.join(sources)}")
+    
+    st.header("Jobs")
+    if _fragment is None:
+        st.button("Refresh progress")  # any rerun re-reads the job files
+    render_jobs()
             
     # Display downloaded images
     st.header("Downloaded Images")
+    source = st.selectbox("Show images from", SOURCES)
     image_dir = os.path.join("downloaded_images", f"{source}_images")
     if os.path.exists(image_dir):
-        images = os.listdir(image_dir)
+        images = list_images(image_dir, os.stat(image_dir).st_mtime_ns)
         if images:
-            for image in images:
-                image_path = os.path.join(image_dir, image)
-                st.image(image_path, caption=image)
+            render_gallery(image_dir, images)
         else:
             st.info("No images downloaded yet")
 
+def render_job(job):
+    """Status line, progress bar and counters for one job"""
+    progress = job["progress"]
+    st.markdown(f"**{job['query']}** from {', '.join(job['sources'])}: {job['status']}")
+    
+    total = job["count"] * len(job["sources"])
+    finished = progress["downloaded"] + progress["failed"]
+    st.progress(1.0 if job["status"] in FINISHED else min(1.0, finished / total) if total else 0.0)
+    st.caption(
+        f"{progress['found']} URLs found, {progress['downloaded']} downloaded, {progress['failed']} failed"
+    )
+    for source, info in job["sources"].items():
+        if info.get("error"):
+            st.error(f"{source}: {info['error']}")
+    if job.get("error"):
+        st.error(job["error"])
+    if job["status"] not in FINISHED and st.button("Cancel", key=f"cancel-{job['id']}"):
+        get_job_manager().cancel(job["id"])
+
+def render_jobs():
+    """Recent jobs, newest first; progress is read from the job files the workers write"""
+    recent = get_job_manager().list_jobs(limit=10)
+    if not recent:
+        st.info("No jobs yet")
+        return
+    for job in recent:
+        render_job(job)
+
+# Poll progress by rerunning only the jobs panel every second, where Streamlit supports it
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+if _fragment is not None:
+    render_jobs = _fragment(run_every=1)(render_jobs)
+
+@st.cache_resource
+def get_thumbnail_cache() -> ThumbnailCache:
+    return ThumbnailCache()
+
+@st.cache_data(show_spinner=False)
+def list_images(image_dir: str, dir_mtime: int):
+    """List images newest first; dir_mtime invalidates the cache when files change"""
+    entries = [
+        entry for entry in os.scandir(image_dir)
+        if entry.name.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    return [entry.name for entry in entries]
+
+def render_gallery(image_dir: str, images, columns: int = 4):
+    """Show one page of cached thumbnails and prefetch the next page"""
+    thumbnails = get_thumbnail_cache()
+    
+    page_size = st.selectbox("Images per page", [12, 24, 48], index=1)
+    page_count = max(1, -(-len(images) // page_size))
+    page = st.number_input("Page", min_value=1, max_value=page_count, value=1)
+    st.caption(f"{len(images)} images, page {page} of {page_count}")
+    
+    start = (page - 1) * page_size
+    page_images = images[start:start + page_size]
+    paths = thumbnails.get_many([os.path.join(image_dir, name) for name in page_images])
+    
+    # Warm the next page while the user looks at this one
+    next_images = images[start + page_size:start + 2 * page_size]
+    thumbnails.prefetch([os.path.join(image_dir, name) for name in next_images])
+    
+    grid = st.columns(columns)
+    for idx, (name, path) in enumerate(zip(page_images, paths)):
+        with grid[idx % columns]:
+            st.image(path, caption=name, use_container_width=True)
+
 if __name__ == "__main__":
     main()  # Just call main(), remove the "Parsed data saved" message
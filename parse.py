@@ -1,142 +1,435 @@
 from langchain_community.llms import Ollama
 from langchain_core.prompts import ChatPromptTemplate
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from chunking import chunk_budget, split_into_chunks, merge_json_results
+from services.api_cache import TTLCache
+import hashlib
+import json
+import os
+import threading
 import time
 import requests
 
-def check_ollama_service():
-    """Check if Ollama service is running and accessible"""
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://127.0.0.1:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "tinyllama")
+# How long Ollama keeps the model loaded between requests
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Seconds a health check result is trusted before asking the server again
+HEALTH_TTL = 30.0
+NUM_CTX = 2048
+# Chunk requests in flight at once; match OLLAMA_NUM_PARALLEL on the server
+CHUNK_CONCURRENCY = int(os.getenv("OLLAMA_CHUNK_CONCURRENCY", "2"))
+# Upper bound on chunks per analysis so huge pages can't run for minutes
+MAX_CHUNKS = int(os.getenv("OLLAMA_MAX_CHUNKS", "12"))
+
+_session = requests.Session()
+_health = {}
+_health_lock = threading.Lock()
+_warmed = set()
+_warm_lock = threading.Lock()
+_analysis_cache = None
+_analysis_cache_lock = threading.Lock()
+
+# Bump whenever PROMPTS, PROMPT_TEMPLATE or the chunk/merge logic changes, so old results are ignored
+PROMPT_VERSION = "1"
+ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH", os.path.join("cache", "analysis_cache.sqlite3"))
+
+def check_ollama_service(base_url=OLLAMA_BASE_URL, max_age=HEALTH_TTL):
+    """Check if Ollama service is running and accessible, reusing recent results"""
+    now = time.monotonic()
+    with _health_lock:
+        cached = _health.get(base_url)
+        if cached and now - cached[1] < max_age:
+            return cached[0]
     try:
-        response = requests.get("http://127.0.0.1:11434/api/tags")
-        return response.status_code == 200
+        response = _session.get(f"{base_url}/api/tags", timeout=2)
+        healthy = response.status_code == 200
     except requests.exceptions.RequestException:
-        return False
+        healthy = False
+    with _health_lock:
+        _health[base_url] = (healthy, now)
+    return healthy
+
+def mark_ollama_unhealthy(base_url=OLLAMA_BASE_URL):
+    """Forget the cached health status so the next call checks again"""
+    with _health_lock:
+        _health.pop(base_url, None)
+
+@lru_cache(maxsize=8)
+def get_model(model_name=OLLAMA_MODEL, base_url=OLLAMA_BASE_URL, temperature=0.3, num_ctx=NUM_CTX, timeout=60):
+    """Long-lived Ollama client, one per model configuration"""
+    return Ollama(
+        model=model_name,
+        base_url=base_url,
+        temperature=temperature,
+        num_ctx=num_ctx,
+        timeout=timeout,
+        keep_alive=OLLAMA_KEEP_ALIVE
+    )
 
-def analyze_website_content(content, analysis_type, custom_query=None):
+def warm_up(model_name=OLLAMA_MODEL, base_url=OLLAMA_BASE_URL):
     """
-    Analyze website content using AI with specific focus areas
+    Load the model into Ollama's memory once per process, without generating anything
+    Call once at startup (main.py does); returns False (and retries next time) if the server is unavailable.
+    """
+    with _warm_lock:
+        if (model_name, base_url) in _warmed:
+            return True
+        if not check_ollama_service(base_url):
+            return False
+        try:
+            # An empty prompt only loads the model
+            response = _session.post(
+                f"{base_url}/api/generate",
+                json={"model": model_name, "keep_alive": OLLAMA_KEEP_ALIVE},
+                timeout=120
+            )
+            if response.status_code != 200:
+                return False
+        except requests.exceptions.RequestException:
+            return False
+        _warmed.add((model_name, base_url))
+        return True
+
+def start_warm_up(model_name=OLLAMA_MODEL, base_url=OLLAMA_BASE_URL):
+    """Run warm_up in a background thread so startup isn't blocked"""
+    thread = threading.Thread(target=warm_up, args=(model_name, base_url), daemon=True)
+    thread.start()
+    return thread
+
+def get_analysis_cache():
+    """Process-wide cache of finished analyses, bounded by ANALYSIS_CACHE_MAX_ENTRIES"""
+    global _analysis_cache
+    with _analysis_cache_lock:
+        if _analysis_cache is None:
+            _analysis_cache = TTLCache(
+                ANALYSIS_CACHE_PATH,
+                ttl=float(os.getenv("ANALYSIS_CACHE_TTL", str(30 * 86400))),
+                stale_ttl=0,
+                max_entries=int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "2000"))
+            )
+        return _analysis_cache
+
+def analysis_cache_key(content, analysis_type, custom_query=None, model_name=OLLAMA_MODEL):
+    """Hash of everything that determines an analysis; whitespace-only edits share a key"""
+    parts = [
+        " ".join(content.split()),
+        analysis_type,
+        " ".join((custom_query or "").split()) if analysis_type == "custom" else "",
+        model_name,
+        NUM_CTX,
+        PROMPT_VERSION,
+    ]
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+PROMPTS = {
+    "Generate Website Summary": """
+        Provide a brief summary of this website content focusing on:
+        1. Main purpose
+        2. Key features
+        3. Target audience
+        Be concise and direct.
+    """,
+    
+    "Analyze Products and Prices": """
+        List only the clearly mentioned products with:
+        - product_name
+        - price
+        - description
+        Format as simple JSON.
+    """,
+    
+    "Extract Contact Information": """
+        Extract only:
+        - emails
+        - phones
+        - addresses
+        - social links
+        Format as simple JSON.
+    """,
+    
+    "Create Content Spreadsheet": """
+        List main:
+        - sections
+        - headers
+        - content blocks
+        Format as simple JSON array.
     """
-    # Check if Ollama service is running
+}
+
+PROMPT_TEMPLATE = ChatPromptTemplate.from_template(
+    "Content: {content}\nTask: {task}\nProvide structured response."
+)
+
+# Analysis types whose chunk results are JSON and get merged, and the response key for each
+JSON_FIELDS = {
+    "Analyze Products and Prices": "products",
+    "Extract Contact Information": "contacts",
+    "Create Content Spreadsheet": "content",
+}
+
+COMBINE_TASK = "The content holds partial answers from different parts of one website. " \
+               "Combine them into a single answer to this task: {task}"
+
+def get_task(analysis_type, custom_query=None):
+    if analysis_type == "custom":
+        return custom_query
+    return PROMPTS[analysis_type]
+
+def connect_model():
+    """
+    Health-check Ollama and return the shared client
+    Returns: (model or None, error response or None)
+    """
+    # Health is cached for HEALTH_TTL seconds, so this rarely costs a request
     if not check_ollama_service():
-        return {
+        return None, {
             "error": "Ollama service is not running. Please start it with 'ollama serve' command",
             "status": "failed"
         }
-
     try:
-        # Initialize Ollama with tinyllama and optimized parameters
-        model = Ollama(
-            model="tinyllama",
-            base_url="http://127.0.0.1:11434",
-            temperature=0.3,
-            num_ctx=2048,
-            timeout=60
-        )
-        
-        # Test the model connection
-        try:
-            model.invoke("test")
-        except Exception as e:
-            return {
-                "error": f"Failed to communicate with Ollama model: {str(e)}",
-                "status": "failed"
-            }
-            
+        # Reuse the long-lived client for tinyllama with optimized parameters
+        return get_model(), None
     except Exception as e:
-        return {
+        return None, {
             "error": f"Failed to initialize Ollama: {str(e)}",
             "status": "failed"
         }
 
-    # Truncate content for better performance
-    max_content_length = 4000
-    if len(content) > max_content_length:
-        content = content[:max_content_length] + "..."
-
-    prompts = {
-        "Generate Website Summary": """
-            Provide a brief summary of this website content focusing on:
-            1. Main purpose
-            2. Key features
-            3. Target audience
-            Be concise and direct.
-        """,
-        
-        "Analyze Products and Prices": """
-            List only the clearly mentioned products with:
-            - product_name
-            - price
-            - description
-            Format as simple JSON.
-        """,
-        
-        "Extract Contact Information": """
-            Extract only:
-            - emails
-            - phones
-            - addresses
-            - social links
-            Format as simple JSON.
-        """,
-        
-        "Create Content Spreadsheet": """
-            List main:
-            - sections
-            - headers
-            - content blocks
-            Format as simple JSON array.
-        """
+def chunk_stats(index, chunk, start_time, error=None):
+    stats = {
+        "chunk": index,
+        "chars": len(chunk),
+        "processing_time": f"{time.time() - start_time:.2f} seconds",
+        "status": "success" if error is None else "failed"
+    }
+    if error:
+        stats["error"] = error
+    return stats
+
+def run_chunks(model, chunks, task, concurrency=CHUNK_CONCURRENCY, first_index=0):
+    """
+    Run the task over every chunk concurrently
+    Returns: (results in chunk order, skipping failures; per-chunk stats)
+    """
+    chain = PROMPT_TEMPLATE | model
+
+    def run(index, chunk):
+        start_time = time.time()
+        try:
+            return chain.invoke({"content": chunk, "task": task}), chunk_stats(index, chunk, start_time)
+        except Exception as e:
+            return None, chunk_stats(index, chunk, start_time, str(e))
+
+    if not chunks:
+        return [], []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(lambda args: run(*args), enumerate(chunks, first_index)))
+    results = [result for result, _ in outcomes if result is not None]
+    return results, [stats for _, stats in outcomes]
+
+def reduce_text_results(model, results, task):
+    """
+    Shrink per-chunk text answers with combine passes until they fit one prompt
+    Returns: (combine task, content for the final pass), or (None, answer) when
+    there is a single answer or the answers can't be shrunk further.
+    """
+    combine_task = COMBINE_TASK.format(task=task)
+    budget = chunk_budget(NUM_CTX, combine_task)
+    while len(results) > 1:
+        chunks = split_into_chunks("\n\n".join(results), budget)
+        if len(chunks) == 1:
+            return combine_task, chunks[0]
+        if len(chunks) >= len(results):
+            break  # answers too long to shrink further; keep them all
+        results, _ = run_chunks(model, chunks, combine_task)
+    return None, "\n\n".join(results)
+
+def combine_text_results(model, results, task):
+    """Reduce per-chunk text answers to one, in as many rounds as the context needs"""
+    combine_task, content = reduce_text_results(model, results, task)
+    if combine_task is None:
+        return content
+    return (PROMPT_TEMPLATE | model).invoke({"content": content, "task": combine_task})
+
+def result_field(analysis_type):
+    """Response key holding the analysis result"""
+    if analysis_type == "Generate Website Summary":
+        return "summary"
+    return JSON_FIELDS.get(analysis_type, "custom")
+
+def merge_chunk_results(results):
+    """Merge JSON chunk results into one structure"""
+    parsed = [parse_json_result(result) for result in results]
+    return parsed[0] if len(parsed) == 1 else merge_json_results(parsed)
+
+def finish_response(analysis_type, result, chunk_count, stats, start_time, cache_key=None):
+    """Build the response dict and cache it when every chunk succeeded"""
+    response = {
+        "processing_time": f"{time.time() - start_time:.2f} seconds",
+        "cache": "miss" if cache_key else "bypass",
+        "status": "success",
+        "chunks": stats
     }
+    if chunk_count > MAX_CHUNKS:
+        response["chunks_skipped"] = chunk_count - MAX_CHUNKS
     
-    prompt_template = ChatPromptTemplate.from_template(
-        "Content: {content}\nTask: {task}\nProvide structured response."
-    )
+    response[result_field(analysis_type)] = result
     
+    # Partial results (a chunk failed) are returned but not reused
+    if cache_key and all(chunk["status"] == "success" for chunk in stats):
+        get_analysis_cache().set(cache_key, response)
+    return response
+
+def failed_response(error, start_time):
+    # The server may have gone away; don't trust the cached health status
+    mark_ollama_unhealthy()
+    return {
+        "error": f"Analysis failed: {str(error)}",
+        "status": "failed",
+        "processing_time": f"{time.time() - start_time:.2f} seconds"
+    }
+
+def cached_response(content, analysis_type, custom_query):
+    """
+    Look up a finished analysis
+    Returns: (response with cache="hit" or None, cache key)
+    """
+    lookup_start = time.time()
+    key = analysis_cache_key(content, analysis_type, custom_query)
+    cached, state = get_analysis_cache().get(key)
+    if state != "fresh":
+        return None, key
+    return dict(cached, processing_time=f"{time.time() - lookup_start:.2f} seconds", cache="hit"), key
+
+def analyze_website_content(content, analysis_type, custom_query=None, use_cache=True):
+    """
+    Analyze website content using AI with specific focus areas
+    Long content is split into chunks that fit the model's context, analyzed
+    concurrently and merged; per-chunk timings are returned under "chunks".
+    Results are cached by content hash; "cache" reports hit, miss or bypass
+    (use_cache=False always regenerates and leaves the cache untouched).
+    """
+    key = None
+    if use_cache:
+        cached, key = cached_response(content, analysis_type, custom_query)
+        if cached:
+            return cached
+
+    model, error = connect_model()
+    if error:
+        return error
+
+    start_time = time.time()
     try:
-        start_time = time.time()
-        chain = prompt_template | model
+        task = get_task(analysis_type, custom_query)
+        chunks = split_into_chunks(content, chunk_budget(NUM_CTX, task))
+        results, stats = run_chunks(model, chunks[:MAX_CHUNKS], task)
+        if not results:
+            raise RuntimeError(stats[0].get("error", "no content to analyze") if stats
+                               else "no content to analyze")
         
-        if analysis_type == "custom":
-            task = custom_query
+        if analysis_type in JSON_FIELDS:
+            result = merge_chunk_results(results)
         else:
-            task = prompts[analysis_type]
+            result = combine_text_results(model, results, task)
         
-        result = chain.invoke({
-            "content": content,
-            "task": task
-        })
+        return finish_response(analysis_type, result, len(chunks), stats, start_time, key)
         
-        processing_time = time.time() - start_time
-        
-        # Process results
-        response = {
-            "processing_time": f"{processing_time:.2f} seconds",
-            "status": "success"
-        }
-        
-        if analysis_type == "Generate Website Summary":
-            response["summary"] = result
-        elif analysis_type == "Analyze Products and Prices":
-            response["products"] = parse_json_result(result)
-        elif analysis_type == "Extract Contact Information":
-            response["contacts"] = parse_json_result(result)
-        elif analysis_type == "Create Content Spreadsheet":
-            response["content"] = parse_json_result(result)
+    except Exception as e:
+        return failed_response(e, start_time)
+
+def stream_website_content(content, analysis_type, custom_query=None, use_cache=True):
+    """
+    Streaming variant of analyze_website_content
+    Yields text tokens as the model produces them, then, as the last item, the
+    same response dict analyze_website_content returns plus "time_to_first_token".
+    On multi-chunk pages JSON analyses stream the first chunk while the rest run
+    concurrently; text analyses stream the final combine pass.
+    """
+    start_time = time.time()
+    if use_cache:
+        cached, key = cached_response(content, analysis_type, custom_query)
+        if cached:
+            result = cached.get(result_field(analysis_type))
+            yield result if isinstance(result, str) else json.dumps(result, indent=2)
+            cached["time_to_first_token"] = f"{time.time() - start_time:.2f} seconds"
+            yield cached
+            return
+    else:
+        key = None
+
+    model, error = connect_model()
+    if error:
+        yield error
+        return
+
+    first_token = []
+
+    def stream(chain_input):
+        for token in (PROMPT_TEMPLATE | model).stream(chain_input):
+            if not first_token:
+                first_token.append(time.time())
+            yield token
+
+    try:
+        task = get_task(analysis_type, custom_query)
+        all_chunks = split_into_chunks(content, chunk_budget(NUM_CTX, task))
+        chunks = all_chunks[:MAX_CHUNKS]
+        if not chunks:
+            raise RuntimeError("no content to analyze")
+
+        if analysis_type in JSON_FIELDS or len(chunks) == 1:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                rest = executor.submit(run_chunks, model, chunks[1:], task,
+                                       max(1, CHUNK_CONCURRENCY - 1), 1)
+                chunk_start = time.time()
+                tokens = []
+                try:
+                    for token in stream({"content": chunks[0], "task": task}):
+                        tokens.append(token)
+                        yield token
+                    first = ["".join(tokens)]
+                    stats = [chunk_stats(0, chunks[0], chunk_start)]
+                except Exception as e:
+                    first = []
+                    stats = [chunk_stats(0, chunks[0], chunk_start, str(e))]
+                rest_results, rest_stats = rest.result()
+            results = first + rest_results
+            stats += rest_stats
         else:
-            response["custom"] = result
-            
-        return response
-        
+            results, stats = run_chunks(model, chunks, task)
+        if not results:
+            raise RuntimeError(stats[0].get("error", "no content to analyze"))
+
+        if analysis_type in JSON_FIELDS:
+            result = merge_chunk_results(results)
+        elif len(chunks) == 1:
+            result = results[0]
+        else:
+            combine_task, combined = reduce_text_results(model, results, task)
+            if combine_task is None:
+                first_token.append(time.time())
+                yield combined
+                result = combined
+            else:
+                result = ""
+                for token in stream({"content": combined, "task": combine_task}):
+                    result += token
+                    yield token
+
+        response = finish_response(analysis_type, result, len(all_chunks), stats, start_time, key)
+        if first_token:
+            response["time_to_first_token"] = f"{first_token[0] - start_time:.2f} seconds"
+        yield response
+
     except Exception as e:
-        return {
-            "error": f"Analysis failed: {str(e)}",
-            "status": "failed",
-            "processing_time": f"{time.time() - start_time:.2f} seconds"
-        }
+        yield failed_response(e, start_time)
 
 def parse_json_result(result):
     """Convert the model's response to structured data"""
     try:
-        import json
         return json.loads(result)
     except:
         return [{"content": str(result)}]
@@ -1,12 +1,20 @@
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
+import atexit
 import os
+import threading
 import requests
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+from driver_pool import DriverPool, ProfilePools
+from downloader import stream_to_temp, MAX_IMAGE_BYTES, MIN_IMAGE_BYTES
+from browser_profiles import FULL, apply_profile, activate_profile
+from fetcher import TieredFetcher
+from text_extract import extract_text, normalize_whitespace
+
+_driver_pools: Optional[ProfilePools] = None
+_driver_pools_lock = threading.Lock()
+_fetcher: Optional[TieredFetcher] = None
+_fetcher_lock = threading.Lock()
 
 def get_source_limits() -> Dict[str, int]:
     """Return the maximum number of images per source"""
@@ -18,51 +26,76 @@ def get_source_limits() -> Dict[str, int]:
         "pexels": 30
     }
 
-def setup_driver() -> webdriver.Chrome:
-    """Setup and return Chrome webdriver with appropriate options"""
+def setup_driver(profile: str = FULL) -> webdriver.Chrome:
+    """Setup and return Chrome webdriver with appropriate options for the browser profile"""
     chrome_options = Options()
     chrome_options.add_argument('--headless')
     chrome_options.add_argument('--no-sandbox')
     chrome_options.add_argument('--disable-dev-shm-usage')
-    return webdriver.Chrome(options=chrome_options)
+    apply_profile(chrome_options, profile)
+    return activate_profile(webdriver.Chrome(options=chrome_options), profile)
+
+def get_driver_pools() -> ProfilePools:
+    """Return the process-wide driver pools (one per profile), sized by DRIVER_POOL_SIZE"""
+    global _driver_pools
+    with _driver_pools_lock:
+        if _driver_pools is None:
+            _driver_pools = ProfilePools(
+                setup_driver,
+                size=int(os.getenv("DRIVER_POOL_SIZE", "2")),
+                max_pages=int(os.getenv("DRIVER_MAX_PAGES", "50")),
+                max_rss_mb=int(os.getenv("DRIVER_MAX_RSS_MB", "1500"))
+            )
+            atexit.register(_driver_pools.close)
+        return _driver_pools
+
+def get_driver_pool(profile: str = FULL) -> DriverPool:
+    """Return the process-wide driver pool for a browser profile"""
+    return get_driver_pools().pool(profile)
 
-def scrape_website(url: str) -> str:
-    """Scrape website content using Selenium"""
-    driver = setup_driver()
+def get_fetcher() -> TieredFetcher:
+    """Return the process-wide HTTP-first fetcher backed by the driver pools"""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = TieredFetcher(get_driver_pool)
+        return _fetcher
+
+def scrape_website(url: str, pool: Optional[DriverPool] = None, profile: str = FULL) -> str:
+    """
+    Scrape website content, trying a plain HTTP GET before a pooled Selenium driver
+    The browser is used when the page looks JS-rendered or the domain is known to need it.
+    profile="harvest" skips images, media, fonts and CSS when only the DOM is needed.
+    """
     try:
-        driver.get(url)
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.TAG_NAME, "body"))
-        )
-        return driver.page_source
+        return get_fetcher().fetch(url, pool, profile)["html"]
     except Exception as e:
         return f"Error scraping website: {str(e)}"
-    finally:
-        driver.quit()
 
-def extract_body_content(html_content: str) -> str:
-    """Extract main content from HTML using BeautifulSoup"""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    # Remove script and style elements
-    for script in soup(["script", "style"]):
-        script.decompose()
-    return soup.get_text()
+def extract_body_content(html_content: str, backend: Optional[str] = None) -> str:
+    """
+    Extract main content from HTML, dropping script, style and noscript elements
+    backend is "selectolax", "lxml" or "bs4"; by default the fastest installed one
+    (EXTRACTION_BACKEND overrides).
+    """
+    return extract_text(html_content, backend)
 
 def clean_body_content(content: str) -> str:
     """Clean and format extracted content"""
-    # Remove extra whitespace and empty lines
-    lines = (line.strip() for line in content.splitlines())
-    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-    return '\n'.join(chunk for chunk in chunks if chunk)
+    # Remove extra whitespace and empty lines in a single split
+    return normalize_whitespace(content)
 
-def download_image(url: str, path: str) -> bool:
-    """Download image from URL to specified path"""
+def download_image(url: str, path: str, max_bytes: Optional[int] = MAX_IMAGE_BYTES,
+                   min_bytes: int = MIN_IMAGE_BYTES) -> bool:
+    """Stream image from URL to specified path via a temp file and atomic rename"""
     try:
-        response = requests.get(url, stream=True)
-        if response.status_code == 200:
-            with open(path, 'wb') as f:
-                f.write(response.content)
-            return True
-        return False
+        with requests.get(url, stream=True, timeout=10) as response:
+            if response.status_code != 200:
+                return False
+            tmp_path, _, _ = stream_to_temp(
+                response, os.path.dirname(os.path.abspath(path)), max_bytes, min_bytes
+            )
+        os.replace(tmp_path, path)
+        return True
     except Exception:
         return False
@@ -0,0 +1,113 @@
+import os
+import signal
+import time
+from typing import Set
+
+from dotenv import load_dotenv
+
+from browser_profiles import FULL, HARVEST
+from driver_pool import ProfilePools
+from image_api import APIImageScraper
+from jobs import JobProgress, FAILED, RUNNING, SUCCEEDED
+from seleniumMASS.scraper import ImageScraper, create_stealth_driver
+from services.image_service import ImageService
+
+# Sources that need a Chrome instance
+BROWSER_SOURCES = {"google", "getty", "shutterstock"}
+SOURCES = ["google", "getty", "shutterstock", "unsplash", "pexels"]
+
+
+def create_driver_pools() -> ProfilePools:
+    """Driver pools for one worker process; Chrome starts on first lease"""
+    return ProfilePools(
+        # Network logging lets Google downloads reuse bytes the browser already loaded;
+        # harvest drivers never load images, so there is nothing to reuse there
+        lambda profile: create_stealth_driver(headless=True, network_logging=profile == FULL,
+                                              profile=profile),
+        size=int(os.getenv("DRIVER_POOL_SIZE", "2"))
+    )
+
+
+def scrape_source(source: str, query: str, num_images: int, driver_pools: ProfilePools,
+                  scraper: ImageScraper, api: APIImageScraper) -> Set[str]:
+    """Collect image URLs from one source"""
+    if source == "google":
+        return scraper.scrape_google_web(query, num_images)
+    if source in ("getty", "shutterstock"):
+        from image_scrapers import GettyImageScraper, ShutterstockScraper
+        scraper_cls = GettyImageScraper if source == "getty" else ShutterstockScraper
+        # Only DOM attributes are read, so skip images, fonts and CSS
+        return set(scraper_cls(driver_pool=driver_pools).scrape(query, num_images, profile=HARVEST))
+
+    search = api.scrape_unsplash if source == "unsplash" else api.scrape_pexels
+    urls, error = search(query, num_images)
+    if error:
+        raise RuntimeError(error["error"])
+    return urls
+
+
+def _exit_on_sigterm(signum, frame):
+    # Unwind through run_job's finally so Chrome and chromedriver are shut down;
+    # a second SIGTERM must not interrupt that cleanup
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    raise SystemExit(128 + signum)
+
+
+def run_job(job_id: str, jobs_dir: str):
+    """
+    Worker process entry point: scrape and download every source of a job,
+    reporting found/downloaded/failed counts as they change
+    """
+    # JobManager.cancel/close terminate the worker with SIGTERM
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+    load_dotenv()
+    progress = JobProgress(jobs_dir, job_id)
+    progress.update(status=RUNNING, started=time.time())
+    query = progress.job["query"]
+    count = progress.job["count"]
+    sources = list(progress.job["sources"])
+
+    image_service = ImageService()
+    driver_pools = create_driver_pools()
+    scraper = ImageScraper(headless=True, driver_pool=driver_pools)
+    api = APIImageScraper()
+    failures = 0
+    try:
+        for source in sources:
+            progress.source(source, status="running")
+            try:
+                output_dir = image_service.store.source_view(source)
+
+                def on_download(url: str, ok: bool, source=source):
+                    progress.add(source, downloaded=int(ok), failed=int(not ok))
+
+                if source == "google":
+                    # Scrape and download in one lease so cached thumbnails are reused
+                    stats = scraper.scrape_and_download_google_web(
+                        query, output_dir, count, prefix=source,
+                        on_scraped=lambda urls: progress.add(source, found=len(urls)),
+                        progress=on_download
+                    )
+                else:
+                    urls = scrape_source(source, query, count, driver_pools, scraper, api)
+                    progress.add(source, found=len(urls))
+                    stats = scraper.download_images(
+                        urls,
+                        output_dir=output_dir,
+                        prefix=source,
+                        query=query,
+                        progress=on_download
+                    )
+                progress.source(source, status="done", duplicates=stats["duplicates"], reused=stats["reused"])
+            except Exception as e:
+                failures += 1
+                progress.source(source, status="failed", error=str(e))
+
+        progress.update(status=FAILED if failures == len(sources) else SUCCEEDED, finished=time.time())
+    except Exception as e:
+        progress.update(status=FAILED, error=str(e), finished=time.time())
+    finally:
+        try:
+            scraper.close()
+        finally:
+            driver_pools.close()
@@ -6,49 +6,116 @@ from selenium.common.exceptions import TimeoutException
 import undetected_chromedriver as uc
 from selenium_stealth import stealth
 from services.image_service import ImageService
+from services.image_store import ImageStore
+from services.image_format import prepare_image_file
+from downloader import DownloadEngine, BodySource, Progress, stream_to_temp, MAX_IMAGE_BYTES, MIN_IMAGE_BYTES
+from driver_pool import DriverPool, ProfilePools
+from browser_profiles import FULL, apply_profile, activate_profile
+from dom_tools import extract_image_urls
+from browser_network import enable_performance_logging, NetworkRecorder, BrowserBodySource
+from contextlib import contextmanager
 import os
+import threading
 import time
-import requests
 import random
-from PIL import Image
-from io import BytesIO
-from typing import Set, Dict, List, Union
+from typing import Set, Dict, List, Optional, Union
 
-class ImageScraper:
-    def __init__(self, headless: bool = True):
-        self.setup_driver(headless)
-        self.image_service = ImageService()
+# Consecutive scroll passes without new URLs before giving up
+MAX_STALLED_PASSES = 3
 
-    def setup_driver(self, headless: bool):
-        options = uc.ChromeOptions()
-        
-        # Stealth settings
+def create_stealth_driver(headless: bool = True, network_logging: bool = False, profile: str = FULL):
+    """
+    Create an undetected Chrome instance with stealth settings applied
+    network_logging records DevTools network events for NetworkRecorder.
+    profile="harvest" starts a lean browser that skips images, media, fonts and CSS.
+    """
+    options = uc.ChromeOptions()
+    
+    # Stealth settings
+    if profile == FULL:
         options.add_argument("--start-maximized")
-        options.add_argument("--disable-blink-features=AutomationControlled")
-        options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        options.add_experimental_option("useAutomationExtension", False)
-        
-        # Additional stealth settings
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--no-sandbox")
         options.add_argument("--window-size=1920,1080")
-        options.add_argument(f"user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/94.0.4606.71 Safari/537.36")
-        
-        if headless:
-            options.add_argument('--headless=new')
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option("useAutomationExtension", False)
+    
+    # Additional stealth settings
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--no-sandbox")
+    options.add_argument(f"user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/94.0.4606.71 Safari/537.36")
+    
+    if headless:
+        options.add_argument('--headless=new')
+    
+    if network_logging:
+        enable_performance_logging(options)
+    apply_profile(options, profile)
 
-        self.driver = uc.Chrome(options=options)
-        
-        # Apply stealth settings
-        stealth(
-            self.driver,
-            languages=["en-US", "en"],
-            vendor="Google Inc.",
-            platform="Win32",
-            webgl_vendor="Intel Inc.",
-            renderer="Intel Iris OpenGL Engine",
-            fix_hairline=True,
-        )
+    driver = uc.Chrome(options=options)
+    activate_profile(driver, profile)
+    
+    # Apply stealth settings
+    stealth(
+        driver,
+        languages=["en-US", "en"],
+        vendor="Google Inc.",
+        platform="Win32",
+        webgl_vendor="Intel Inc.",
+        renderer="Intel Iris OpenGL Engine",
+        fix_hairline=True,
+    )
+    return driver
+
+
+class ImageScraper:
+    def __init__(self, headless: bool = True,
+                 driver_pool: Optional[Union[DriverPool, ProfilePools]] = None,
+                 profile: str = FULL):
+        # With a pool, drivers are borrowed per call instead of owned by the instance.
+        # Leased drivers are thread-local so one pooled scraper can serve several threads.
+        # ProfilePools additionally lets each call pick its browser profile.
+        self.driver_pool = driver_pool
+        self._leased = threading.local()
+        self._own_driver = None
+        # Profile of the owned driver; pooled drivers carry their pool's profile
+        self.profile = profile
+        if driver_pool is None:
+            self.setup_driver(headless, profile)
+        self.image_service = ImageService()
+        self.store = ImageStore()
+        self.downloader = DownloadEngine(headers={'Referer': 'https://www.google.com/'})
+
+    def setup_driver(self, headless: bool, profile: str = FULL):
+        self.driver = create_stealth_driver(headless, profile=profile)
+
+    @property
+    def driver(self):
+        leased = getattr(self._leased, 'driver', None)
+        return leased if leased is not None else self._own_driver
+
+    @driver.setter
+    def driver(self, value):
+        self._own_driver = value
+
+    @contextmanager
+    def browser(self, profile: Optional[str] = None):
+        """
+        Provide self.driver, leasing one from the pool when configured
+        A profile other than the pool's needs ProfilePools; an owned driver only serves
+        the profile it was started with, and any other raises ValueError.
+        """
+        if self.driver_pool is None:
+            if profile is not None and profile != self.profile:
+                raise ValueError(f"Scraper owns a '{self.profile}' driver, not '{profile}'; pass a ProfilePools pool")
+            yield self.driver
+            return
+        lease = self.driver_pool.lease(profile=profile) if profile else self.driver_pool.lease()
+        with lease as driver:
+            self._leased.driver = driver
+            try:
+                yield driver
+            finally:
+                self._leased.driver = None
 
     def random_sleep(self, min_time: float = 1.0, max_time: float = 3.0):
         """Randomized sleep to mimic human behavior"""
@@ -76,79 +143,118 @@ class ImageScraper:
                 self.driver.execute_script(f"window.scrollTo({{top: {current_position}, behavior: 'smooth'}})")
                 self.random_sleep(0.5, 1.5)
 
-    def scrape_google_web(self, query: str, max_images: int = 30) -> Set[str]:
-        """Scrape images from Google Images using web scraping with human-like behavior"""
+    def hover_random_elements(self, selector: str, count: int = 3):
+        """Move the mouse over a few random matching elements"""
+        elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+        for element in random.sample(elements, min(count, len(elements))):
+            try:
+                webdriver.ActionChains(self.driver).move_to_element(element).perform()
+                self.random_sleep(0.1, 0.3)
+            except Exception as e:
+                print(f"Error hovering image: {str(e)}")
+
+    def scrape_google_web(self, query: str, max_images: int = 30, profile: Optional[str] = None) -> Set[str]:
+        """
+        Scrape images from Google Images using web scraping with human-like behavior
+        profile="harvest" collects thumbnail URLs without loading the images themselves.
+        """
+        with self.browser(profile):
+            return self._scrape_google_web(query, max_images)
+
+    def scrape_and_download_google_web(self, query: str, output_dir: str, max_images: int = 30,
+                                       prefix: str = "google", on_scraped=None, **download_options) -> Dict:
+        """
+        Scrape Google Images and download the results within one browser lease,
+        reusing image bytes the browser already fetched (HTTP only for the rest)
+        Needs a driver created with network_logging=True to reuse anything.
+        on_scraped(urls) is called once scraping is done, before downloads start.
+        """
+        with self.browser():
+            recorder = NetworkRecorder(self.driver)
+            recorder.reset()
+            urls = self._scrape_google_web(query, max_images)
+            if on_scraped is not None:
+                on_scraped(urls)
+            return self.download_images(urls, output_dir, prefix=prefix, query=query,
+                                        body_source=BrowserBodySource(recorder), **download_options)
+
+    def _scrape_google_web(self, query: str, max_images: int) -> Set[str]:
         self.driver.get(f"https://www.google.com/search?q={query}&tbm=isch")
         image_urls = set()
         
         # Initial wait for page load
         self.random_sleep(2.0, 4.0)
         
-        while len(image_urls) < max_images:
+        # Probe for automation once per page instead of once per thumbnail
+        automated = self.driver.execute_script("return navigator.webdriver")
+        
+        stalled = 0
+        while len(image_urls) < max_images and stalled < MAX_STALLED_PASSES:
+            found_before = len(image_urls)
+            
             # Human-like scrolling
             self.random_scroll()
             
-            # Find all image elements with random pauses
-            thumbnails = self.driver.find_elements(By.CSS_SELECTOR, "img.rg_i")
+            # Sometimes move mouse over a few thumbnails (when not flagged as automated)
+            if not automated:
+                self.hover_random_elements("img.rg_i")
             
-            # Extract image URLs with human-like behavior
-            for img in thumbnails:
-                try:
-                    # Sometimes move mouse to element (when not in headless mode)
-                    if not self.driver.execute_script("return navigator.webdriver"):
-                        actions = webdriver.ActionChains(self.driver)
-                        actions.move_to_element(img).perform()
-                        self.random_sleep(0.1, 0.3)
-                    
-                    if img.get_attribute('src') and img.get_attribute('src').startswith('http'):
-                        image_urls.add(img.get_attribute('src'))
-                        
-                except Exception as e:
-                    print(f"Error processing image: {str(e)}")
-                    continue
+            # Extract every thumbnail URL in a single round trip
+            for url in extract_image_urls(self.driver, "img.rg_i"):
+                image_urls.add(url)
+                if len(image_urls) >= max_images:
+                    break
                 
             if len(image_urls) >= max_images:
                 break
+            
+            # Give up once several passes in a row add nothing new
+            stalled = stalled + 1 if len(image_urls) == found_before else 0
                 
             # Random pause between iterations
             self.random_sleep(1.0, 2.0)
                 
         return set(list(image_urls)[:max_images])
 
-    def download_images(self, urls: Set[str], output_dir: str, prefix: str = "") -> Dict[str, int]:
-        """Download images from URLs to specified directory with human-like delays"""
+    def download_images(self, urls: Set[str], output_dir: str, prefix: str = "",
+                        query: Optional[str] = None, target_format: Optional[str] = None,
+                        max_bytes: Optional[int] = MAX_IMAGE_BYTES,
+                        min_bytes: int = MIN_IMAGE_BYTES,
+                        body_source: Optional[BodySource] = None,
+                        progress: Optional[Progress] = None) -> Dict:
+        """
+        Download images concurrently into the content-addressed store and link
+        them into output_dir; identical images are written only once.
+        Bodies are streamed to disk in chunks and must fit [min_bytes, max_bytes].
+        Original bytes are kept unless target_format (e.g. "JPEG") is given.
+        URLs body_source can answer (e.g. from the browser cache) skip the network.
+        progress(url, ok) is called as each download finishes.
+        """
         os.makedirs(output_dir, exist_ok=True)
-        
-        successful = 0
-        failed = 0
-        
-        for idx, url in enumerate(urls):
+        duplicates = []
+
+        def save(idx: int, url: str, response) -> bool:
+            tmp_path, digest, _ = stream_to_temp(response, self.store.tmp_dir, max_bytes, min_bytes)
             try:
-                # Add random delays between downloads
-                self.random_sleep(0.5, 1.5)
-                
-                # Use realistic headers for requests
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/94.0.4606.71 Safari/537.36',
-                    'Accept': 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
-                    'Accept-Language': 'en-US,en;q=0.9',
-                    'Referer': 'https://www.google.com/'
-                }
-                
-                response = requests.get(url, headers=headers, timeout=10)
-                if response.status_code == 200:
-                    img = Image.open(BytesIO(response.content))
-                    filename = f"{prefix}_{idx+1}.jpg" if prefix else f"image_{idx+1}.jpg"
-                    filepath = os.path.join(output_dir, filename)
-                    img.save(filepath, "JPEG")
-                    successful += 1
-                else:
-                    failed += 1
-            except Exception as e:
-                print(f"Failed to download {url}: {str(e)}")
-                failed += 1
-                
-        return {"successful": successful, "failed": failed}
+                ext = prepare_image_file(tmp_path, target_format)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+            digest, path, is_new = self.store.adopt(tmp_path, ext, None if target_format else digest)
+            if not is_new:
+                duplicates.append(url)
+            name = f"{prefix or 'image'}_{digest[:16]}.{ext}"
+            self.store.link(path, output_dir, name)
+            if query:
+                self.store.link(path, self.store.query_view(query), name)
+            return True
+
+        stats = self.downloader.download(urls, save, body_source, progress)
+        stats["duplicates"] = len(duplicates)
+        for url, error in stats["errors"].items():
+            print(f"Failed to download {url}: {error}")
+
+        return stats
 
     def search_images(self, query: str, sources: List[str], max_images: int = 30) -> Dict[str, Set[str]]:
         """Search images from multiple sources"""
@@ -165,9 +271,16 @@ class ImageScraper:
         
         return results
 
+    def close(self):
+        """Release the downloader and quit the owned driver (pooled drivers stay with the pool)"""
+        if hasattr(self, 'downloader'):
+            self.downloader.close()
+        if getattr(self, '_own_driver', None) is not None:
+            self._own_driver.quit()
+            self._own_driver = None
+
     def __del__(self):
-        if hasattr(self, 'driver'):
-            self.driver.quit()
+        self.close()
 
 # Example usage
 if __name__ == "__main__":
@@ -193,4 +306,4 @@ if __name__ == "__main__":
                 print(f"Failed downloads: {stats['failed']}")
                 
     finally:
-        scraper.driver.quit()
\ No newline at end of file
+        scraper.close()
\ No newline at end of file
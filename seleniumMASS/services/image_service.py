@@ -1,12 +1,21 @@
 import os
+import time
 import requests
-from typing import List, Dict, Optional, Set
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Optional, Set, Tuple
 from dotenv import load_dotenv
+from services.api_cache import TTLCache, cache_key, get_default_cache
+from services.pagination import PROVIDER_PAGING, fetch_pages, page_size_for
 
 load_dotenv()
 
+# Default per-source and overall deadlines for search_all_apis, in seconds
+SOURCE_TIMEOUT = 8.0
+OVERALL_TIMEOUT = 12.0
+
 class ImageService:
-    def __init__(self):
+    def __init__(self, cache: Optional[TTLCache] = None):
         self.api_keys = {
             'unsplash': os.getenv('UNSPLASH_ACCESS_KEY'),
             'pexels': os.getenv('PEXELS_API_KEY'),
@@ -33,91 +42,200 @@ class ImageService:
             }
         }
 
-    def search_unsplash(self, query: str, max_images: int = 30) -> Set[str]:
-        if not self.api_keys['unsplash']:
-            return set()
-        
+        # One pooled session shared by every provider call
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount('https://', adapter)
+        self.cache = cache or get_default_cache()
+
+    def is_configured(self, source: str) -> bool:
+        """Check whether the credentials for an API source are set"""
+        if source == 'google':
+            return bool(self.api_keys['google']['key'] and self.api_keys['google']['cx'])
+        return bool(self.api_keys.get(source))
+
+    @property
+    def page_fetchers(self):
+        """Map of API sources to functions fetching one page of results"""
+        return {
+            'unsplash': self._fetch_unsplash_page,
+            'pexels': self._fetch_pexels_page,
+            'bing': self._fetch_bing_page,
+            'google': self._fetch_google_page
+        }
+
+    def _fetch_unsplash_page(self, query: str, page: int, per_page: int, timeout: float) -> List[str]:
         headers = {"Authorization": f"Client-ID {self.api_keys['unsplash']}"}
         url = "https://api.unsplash.com/search/photos"
         
-        try:
-            response = requests.get(url, 
-                                 headers=headers, 
-                                 params={"query": query, "per_page": max_images})
-            response.raise_for_status()
-            return {photo["urls"]["regular"] for photo in response.json().get("results", [])}
-        except Exception as e:
-            print(f"Unsplash API error: {str(e)}")
-            return set()
+        response = self.session.get(url, 
+                                    headers=headers, 
+                                    params={"query": query, "per_page": per_page, "page": page},
+                                    timeout=timeout)
+        response.raise_for_status()
+        return [photo["urls"]["regular"] for photo in response.json().get("results", [])]
 
-    def search_pexels(self, query: str, max_images: int = 30) -> Set[str]:
-        if not self.api_keys['pexels']:
-            return set()
-        
+    def _fetch_pexels_page(self, query: str, page: int, per_page: int, timeout: float) -> List[str]:
         headers = {"Authorization": self.api_keys['pexels']}
         url = "https://api.pexels.com/v1/search"
         
-        try:
-            response = requests.get(url, 
-                                 headers=headers, 
-                                 params={"query": query, "per_page": max_images})
-            response.raise_for_status()
-            return {photo["src"]["large"] for photo in response.json().get("photos", [])}
-        except Exception as e:
-            print(f"Pexels API error: {str(e)}")
-            return set()
+        response = self.session.get(url, 
+                                    headers=headers, 
+                                    params={"query": query, "per_page": per_page, "page": page},
+                                    timeout=timeout)
+        response.raise_for_status()
+        return [photo["src"]["large"] for photo in response.json().get("photos", [])]
 
-    def search_bing(self, query: str, max_images: int = 30) -> Set[str]:
-        if not self.api_keys['bing']:
-            return set()
-        
+    def _fetch_bing_page(self, query: str, page: int, per_page: int, timeout: float) -> List[str]:
         headers = {'Ocp-Apim-Subscription-Key': self.api_keys['bing']}
         url = 'https://api.bing.microsoft.com/v7.0/images/search'
         
-        try:
-            response = requests.get(url, 
-                                 headers=headers, 
-                                 params={"q": query, "count": max_images})
-            response.raise_for_status()
-            return {image["contentUrl"] for image in response.json().get("value", [])}
-        except Exception as e:
-            print(f"Bing API error: {str(e)}")
-            return set()
+        response = self.session.get(url, 
+                                    headers=headers, 
+                                    params={"q": query, "count": per_page, "offset": (page - 1) * per_page},
+                                    timeout=timeout)
+        response.raise_for_status()
+        return [image["contentUrl"] for image in response.json().get("value", [])]
 
-    def search_google(self, query: str, max_images: int = 30) -> Set[str]:
-        if not self.api_keys['google']['key'] or not self.api_keys['google']['cx']:
-            return set()
-        
+    def _fetch_google_page(self, query: str, page: int, per_page: int, timeout: float) -> List[str]:
         url = 'https://www.googleapis.com/customsearch/v1'
         params = {
             'q': query,
             'cx': self.api_keys['google']['cx'],
             'key': self.api_keys['google']['key'],
             'searchType': 'image',
-            'num': max_images
+            'num': per_page,
+            'start': (page - 1) * per_page + 1
         }
         
+        response = self.session.get(url, params=params, timeout=timeout)
+        response.raise_for_status()
+        return [item["link"] for item in response.json().get("items", [])]
+
+    def _fetch(self, source: str, query: str, max_images: int, timeout: float) -> Set[str]:
+        """Fetch as many pages as max_images needs, concurrently within the provider's limits"""
+        paging = PROVIDER_PAGING[source]
+        per_page = page_size_for(source, max_images)
+        fetch_page = self.page_fetchers[source]
+        return set(fetch_pages(
+            lambda page: fetch_page(query, page, per_page, timeout),
+            max_images,
+            per_page,
+            max_pages=paging['max_pages'],
+            concurrency=paging['concurrency']
+        ))
+
+    def _cached_fetch(self, source: str, query: str, max_images: int, timeout: float) -> Tuple[Set[str], str]:
+        """
+        Fetch through the response cache
+        Returns: (urls, cache_state) where cache_state is "fresh", "stale" or "miss"
+        """
+        urls, state = self.cache.get_or_fetch(
+            cache_key(source, query, max_images),
+            lambda: sorted(self._fetch(source, query, max_images, timeout))
+        )
+        return set(urls), state
+
+    def _search(self, source: str, label: str, query: str, max_images: int, timeout: float) -> Set[str]:
+        if not self.is_configured(source):
+            return set()
         try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            return {item["link"] for item in response.json().get("items", [])}
+            return self._cached_fetch(source, query, max_images, timeout)[0]
         except Exception as e:
-            print(f"Google API error: {str(e)}")
+            print(f"{label} API error: {str(e)}")
             return set()
 
-    def search_all_apis(self, query: str, max_images_per_source: int = 30) -> Dict[str, Set[str]]:
+    def search_unsplash(self, query: str, max_images: int = 30, timeout: float = SOURCE_TIMEOUT) -> Set[str]:
+        return self._search('unsplash', 'Unsplash', query, max_images, timeout)
+
+    def search_pexels(self, query: str, max_images: int = 30, timeout: float = SOURCE_TIMEOUT) -> Set[str]:
+        return self._search('pexels', 'Pexels', query, max_images, timeout)
+
+    def search_bing(self, query: str, max_images: int = 30, timeout: float = SOURCE_TIMEOUT) -> Set[str]:
+        return self._search('bing', 'Bing', query, max_images, timeout)
+
+    def search_google(self, query: str, max_images: int = 30, timeout: float = SOURCE_TIMEOUT) -> Set[str]:
+        return self._search('google', 'Google', query, max_images, timeout)
+
+    def search_all_apis(self, query: str, max_images_per_source: int = 30,
+                        source_timeout: float = SOURCE_TIMEOUT,
+                        overall_timeout: float = OVERALL_TIMEOUT) -> Dict[str, Set[str]]:
         """Search all configured API sources for images"""
-        results = {}
-        
-        # Map of search functions
-        search_functions = {
-            'unsplash': self.search_unsplash,
-            'pexels': self.search_pexels,
-            'bing': self.search_bing,
-            'google': self.search_google
-        }
-        
-        for source, search_func in search_functions.items():
-            results[source] = search_func(query, max_images_per_source)
-            
-        return results
\ No newline at end of file
+        results, _ = self.search_all_apis_with_status(
+            query, max_images_per_source, source_timeout, overall_timeout
+        )
+        return results
+
+    def search_all_apis_with_status(self, query: str, max_images_per_source: int = 30,
+                                    source_timeout: float = SOURCE_TIMEOUT,
+                                    overall_timeout: float = OVERALL_TIMEOUT,
+                                    source_timeouts: Optional[Dict[str, float]] = None
+                                    ) -> Tuple[Dict[str, Set[str]], Dict[str, Dict]]:
+        """
+        Query all API sources concurrently with per-source and overall deadlines
+        Returns: (results per source, status per source)
+        Each status holds "status" (ok/error/timeout/not_configured), "latency" and "error",
+        plus "cache" (fresh/stale/miss) for successful sources.
+        """
+        source_timeouts = source_timeouts or {}
+        results = {source: set() for source in self.page_fetchers}
+        statuses = {}
+
+        start = time.monotonic()
+        overall_deadline = start + overall_timeout
+        deadlines = {}
+        futures = {}
+
+        def timed(source, timeout):
+            began = time.monotonic()
+            urls, cache_state = self._cached_fetch(source, query, max_images_per_source, timeout)
+            return urls, cache_state, time.monotonic() - began
+
+        executor = ThreadPoolExecutor(max_workers=len(self.page_fetchers))
+        for source in self.page_fetchers:
+            if not self.is_configured(source):
+                statuses[source] = {"status": "not_configured", "latency": 0.0, "error": None}
+                continue
+            timeout = source_timeouts.get(source, source_timeout)
+            deadlines[source] = min(start + timeout, overall_deadline)
+            futures[executor.submit(timed, source, timeout)] = source
+
+        pending = set(futures)
+        while pending:
+            remaining = min(deadlines[futures[f]] for f in pending) - time.monotonic()
+            if remaining > 0:
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            else:
+                done = set()
+
+            for future in done:
+                source = futures[future]
+                try:
+                    urls, cache_state, latency = future.result()
+                    results[source] = urls
+                    statuses[source] = {
+                        "status": "ok",
+                        "latency": round(latency, 3),
+                        "error": None,
+                        "cache": cache_state
+                    }
+                except Exception as e:
+                    statuses[source] = {
+                        "status": "error",
+                        "latency": round(time.monotonic() - start, 3),
+                        "error": str(e)
+                    }
+
+            # Give up on sources whose deadline has passed; their threads finish in the background
+            now = time.monotonic()
+            for future in [f for f in pending if deadlines[futures[f]] <= now]:
+                pending.discard(future)
+                future.cancel()
+                statuses[futures[future]] = {
+                    "status": "timeout",
+                    "latency": round(now - start, 3),
+                    "error": "Deadline exceeded"
+                }
+
+        executor.shutdown(wait=False)
+        return results, statuses
\ No newline at end of file
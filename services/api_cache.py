@@ -0,0 +1,151 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DEFAULT_CACHE_PATH = os.getenv("API_CACHE_PATH", os.path.join("cache", "api_cache.sqlite3"))
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so trivially different queries share an entry"""
+    return " ".join(query.lower().split())
+
+
+def cache_key(provider: str, query: str, *params) -> str:
+    return "|".join([provider, normalize_query(query)] + [str(p) for p in params])
+
+
+class TTLCache:
+    """
+    SQLite-backed JSON cache with TTL, LRU eviction and stale-while-revalidate.
+    Entries younger than `ttl` are fresh. Entries up to `ttl + stale_ttl` old are
+    returned immediately while a background refresh replaces them.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: float = 3600,
+                 stale_ttl: float = 86400, max_entries: int = 5000):
+        self.path = path
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.counters = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._executor = ThreadPoolExecutor(max_workers=2)
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Tuple[Optional[Any], str]:
+        """
+        Look up a key without fetching
+        Returns: (value, state) where state is "fresh", "stale" or "miss"
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None, "miss"
+            value, created = row
+            age = now - created
+            if age > self.ttl + self.stale_ttl:
+                return None, "miss"
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(value), "fresh" if age <= self.ttl else "stale"
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            if count > self.max_entries:
+                excess = count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    "(SELECT key FROM entries ORDER BY accessed ASC LIMIT ?)", (excess,)
+                )
+                self.counters["evictions"] += excess
+            self._conn.commit()
+
+    def _refresh(self, key: str, fetch: Callable[[], Any]):
+        try:
+            self.set(key, fetch())
+            with self._lock:
+                self.counters["refreshes"] += 1
+        except Exception as e:
+            print(f"Cache refresh failed for {key}: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Any]) -> Tuple[Any, str]:
+        """
+        Return the cached value, serving stale entries while refreshing them in
+        the background; on a miss, call fetch() and store its result.
+        Exceptions from fetch() on a miss propagate and nothing is cached.
+        Returns: (value, state) where state is "fresh", "stale" or "miss"
+        """
+        value, state = self.get(key)
+        with self._lock:
+            if state == "fresh":
+                self.counters["hits"] += 1
+            elif state == "stale":
+                self.counters["stale_hits"] += 1
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    self._executor.submit(self._refresh, key, fetch)
+            else:
+                self.counters["misses"] += 1
+        if state != "miss":
+            return value, state
+
+        value = fetch()
+        self.set(key, value)
+        return value, state
+
+    def stats(self) -> Dict[str, float]:
+        """Counters plus entry count and hit ratio, for tuning TTLs and size"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            stats = dict(self.counters, entries=entries)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+
+def get_default_cache() -> TTLCache:
+    """Process-wide cache for image search API responses"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TTLCache(
+                ttl=float(os.getenv("API_CACHE_TTL", "3600")),
+                stale_ttl=float(os.getenv("API_CACHE_STALE_TTL", "86400")),
+                max_entries=int(os.getenv("API_CACHE_MAX_ENTRIES", "5000"))
+            )
+        return _default_cache
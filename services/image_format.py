@@ -0,0 +1,80 @@
+import os
+from typing import Optional
+from PIL import Image
+
+# Leading signatures of the formats we accept, mapped to file extensions
+SIGNATURES = [
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+    (b'II*\x00', 'tiff'),
+    (b'MM\x00*', 'tiff'),
+    (b'\x00\x00\x01\x00', 'ico'),
+]
+
+# File extension for each Pillow format name
+FORMAT_EXTENSIONS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+    'BMP': 'bmp',
+    'TIFF': 'tiff',
+}
+
+
+def sniff_format(data: bytes) -> Optional[str]:
+    """Return the file extension implied by the magic bytes, or None"""
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    if data[4:8] == b'ftyp' and data[8:12] in (b'avif', b'avis'):
+        return 'avif'
+    for signature, ext in SIGNATURES:
+        if data.startswith(signature):
+            return ext
+    return None
+
+
+def validate_image_file(path: str) -> str:
+    """
+    Check the file is an image without decoding pixels; only the header is read
+    Returns the file extension; raises ValueError for non-images
+    """
+    with open(path, 'rb') as f:
+        ext = sniff_format(f.read(16))
+    if ext is None:
+        raise ValueError("Unrecognised image signature")
+    try:
+        with Image.open(path) as img:
+            img.verify()
+    except Exception as e:
+        raise ValueError(f"Invalid {ext} image: {str(e)}")
+    return ext
+
+
+def encode_image_file(path: str, target_format: str) -> str:
+    """Re-encode the file at path in place; returns the new extension"""
+    fmt = target_format.upper()
+    if fmt == 'JPG':
+        fmt = 'JPEG'
+    tmp_path = f"{path}.enc"
+    with Image.open(path) as img:
+        # JPEG has no alpha or palette; flatten those modes instead of failing
+        if fmt == 'JPEG' and img.mode not in ('RGB', 'L', 'CMYK'):
+            img = img.convert('RGB')
+        img.save(tmp_path, fmt)
+    os.replace(tmp_path, path)
+    return FORMAT_EXTENSIONS.get(fmt, fmt.lower())
+
+
+def prepare_image_file(path: str, target_format: Optional[str] = None) -> str:
+    """
+    Validate a downloaded image file for saving
+    Keeps the original bytes unless a target format is requested.
+    Returns the file extension to save under
+    """
+    if target_format:
+        return encode_image_file(path, target_format)
+    return validate_image_file(path)
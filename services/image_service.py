@@ -1,12 +1,14 @@
-from PIL import Image
-from io import BytesIO
 import os
 import requests
 from typing import Optional, Tuple
+from downloader import BodySource, BufferedResponse, stream_to_temp, MAX_IMAGE_BYTES, MIN_IMAGE_BYTES
+from services.image_format import prepare_image_file
+from services.image_store import ImageStore
 
 class ImageService:
     def __init__(self):
         self.base_path = "downloaded_images"
+        self.store = ImageStore(self.base_path)
         self.ensure_directories()
 
     def ensure_directories(self):
@@ -22,27 +24,44 @@ class ImageService:
             dir_path = os.path.join(self.base_path, dir_name)
             os.makedirs(dir_path, exist_ok=True)
 
-    def download_image(self, url: str, source: str, filename: str) -> Tuple[bool, Optional[str]]:
+    def download_image(self, url: str, source: str, filename: str,
+                       query: Optional[str] = None,
+                       target_format: Optional[str] = None,
+                       max_bytes: Optional[int] = MAX_IMAGE_BYTES,
+                       min_bytes: int = MIN_IMAGE_BYTES,
+                       body_source: Optional[BodySource] = None) -> Tuple[bool, Optional[str]]:
         """
-        Download an image from URL and save it to the appropriate directory
+        Download an image from URL into the content-addressed store and link it
+        into the source (and optional query) directory.
+        The body is streamed to disk in chunks and must fit [min_bytes, max_bytes].
+        The original bytes are kept and the filename extension follows the
+        actual format, unless target_format requests a re-encode.
+        Bytes from body_source (e.g. the browser) are used when available.
         Returns: (success: bool, error_message: Optional[str])
         """
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
+            content = body_source(url) if body_source else None
+            if content is not None:
+                tmp_path, digest, _ = stream_to_temp(BufferedResponse(url, content), self.store.tmp_dir,
+                                                     max_bytes, min_bytes)
+            else:
+                with requests.get(url, timeout=10, stream=True) as response:
+                    response.raise_for_status()
+                    tmp_path, digest, _ = stream_to_temp(response, self.store.tmp_dir, max_bytes, min_bytes)
             
-            # Verify it's an image
-            img = Image.open(BytesIO(response.content))
+            # Verify it's an image (header only) or re-encode on request
+            try:
+                ext = prepare_image_file(tmp_path, target_format)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+            name = f"{os.path.splitext(filename)[0]}.{ext}"
             
-            # Determine save directory based on source
-            save_dir = os.path.join(self.base_path, f"{source}_images")
-            os.makedirs(save_dir, exist_ok=True)
-            
-            # Save path
-            save_path = os.path.join(save_dir, filename)
-            
-            # Save image
-            img.save(save_path)
+            # Identical images are stored once and only linked again
+            _, path, _ = self.store.adopt(tmp_path, ext, None if target_format else digest)
+            self.store.link(path, self.store.source_view(source), name)
+            if query:
+                self.store.link(path, self.store.query_view(query), name)
             return True, None
             
         except requests.RequestException as e:
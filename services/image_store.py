@@ -0,0 +1,74 @@
+import hashlib
+import os
+import re
+from typing import Optional, Tuple
+
+
+def file_digest(path: str, chunk_size: int = 64 * 1024) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ImageStore:
+    """
+    Content-addressed image store.
+    Every image is written once to objects/<aa>/<bb>/<sha256>.<ext>; per-source
+    and per-query directories only hold hard links (or symlinks) to those objects.
+    """
+
+    def __init__(self, base_path: str = "downloaded_images"):
+        self.base_path = base_path
+        self.objects_path = os.path.join(base_path, "objects")
+        # Partial downloads live next to the objects so renames stay atomic
+        self.tmp_dir = os.path.join(self.objects_path, "tmp")
+
+    def object_path(self, digest: str, ext: str) -> str:
+        """Sharded location of an object"""
+        return os.path.join(self.objects_path, digest[:2], digest[2:4], f"{digest}.{ext.lstrip('.')}")
+
+    def source_view(self, source: str) -> str:
+        return os.path.join(self.base_path, f"{source}_images")
+
+    def query_view(self, query: str) -> str:
+        slug = re.sub(r'[^a-z0-9]+', '_', query.lower()).strip('_') or "query"
+        return os.path.join(self.base_path, "queries", slug)
+
+    def adopt(self, tmp_path: str, ext: str, digest: Optional[str] = None) -> Tuple[str, str, bool]:
+        """
+        Move a fully written temp file into the store, or drop it if the object exists
+        Returns: (digest, object_path, is_new)
+        """
+        if digest is None:
+            digest = file_digest(tmp_path)
+        path = self.object_path(digest, ext)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            return digest, path, False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        return digest, path, True
+
+    def link(self, object_path: str, view_dir: str, name: str) -> str:
+        """Expose an object under view_dir/name as a hard link, falling back to a symlink"""
+        os.makedirs(view_dir, exist_ok=True)
+        dest = os.path.join(view_dir, name)
+
+        if os.path.lexists(dest):
+            try:
+                if os.path.samefile(dest, object_path):
+                    return dest
+            except OSError:
+                pass  # dangling symlink
+            os.remove(dest)
+
+        try:
+            os.link(object_path, dest)
+        except OSError:
+            # Cross-device or unsupported filesystem
+            os.symlink(os.path.relpath(object_path, view_dir), dest)
+        return dest
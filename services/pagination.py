@@ -0,0 +1,89 @@
+import math
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional
+
+# Per-provider paging limits: largest page size, most pages reachable, and how
+# many page requests may be in flight at once without tripping rate limits
+PROVIDER_PAGING: Dict[str, Dict[str, Optional[int]]] = {
+    'unsplash': {'page_size': 30, 'max_pages': None, 'concurrency': 2},
+    'pexels': {'page_size': 80, 'max_pages': None, 'concurrency': 3},
+    'bing': {'page_size': 150, 'max_pages': None, 'concurrency': 3},
+    # Custom Search never returns results past the 100th
+    'google': {'page_size': 10, 'max_pages': 10, 'concurrency': 2},
+}
+
+
+def page_size_for(provider: str, target: int) -> int:
+    return max(1, min(target, PROVIDER_PAGING[provider]['page_size']))
+
+
+def fetch_pages(fetch_page: Callable[[int], List[str]], target: int, page_size: int,
+                max_pages: Optional[int] = None, concurrency: int = 2,
+                slack_pages: int = 1) -> List[str]:
+    """
+    Fetch 1-based pages concurrently until `target` unique items are collected
+    Requests only the pages needed for the target (plus up to `slack_pages` to
+    make up for duplicates), stops at the first short page, and cancels pages
+    still queued once the target is reached. Order follows page order.
+    A failure on page 1 is raised; later failures just end pagination.
+    """
+    wanted = math.ceil(target / page_size)
+    limit = wanted + slack_pages
+    if max_pages is not None:
+        wanted = min(wanted, max_pages)
+        limit = min(limit, max_pages)
+
+    pages: Dict[int, List[str]] = {}
+    last_page = wanted
+    next_page = 1
+    running = {}
+
+    def collected() -> List[str]:
+        seen = set()
+        items = []
+        for page in sorted(pages):
+            for item in pages[page]:
+                if item not in seen:
+                    seen.add(item)
+                    items.append(item)
+        return items
+
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        while True:
+            while next_page <= last_page and len(running) < concurrency:
+                running[executor.submit(fetch_page, next_page)] = next_page
+                next_page += 1
+            if not running:
+                # Duplicates left us short: reach for one more page if allowed
+                if last_page < limit and len(collected()) < target and last_page == next_page - 1:
+                    last_page += 1
+                    continue
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                page = running.pop(future)
+                try:
+                    items = future.result()
+                except Exception:
+                    if page == 1:
+                        raise
+                    last_page = min(last_page, page - 1)
+                    limit = last_page
+                    continue
+                pages[page] = items
+                if len(items) < page_size:
+                    # Provider ran out of results
+                    last_page = min(last_page, page)
+                    limit = last_page
+
+            if len(collected()) >= target:
+                break
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    # Drop pages beyond a short or failed page so results stay contiguous
+    for page in [p for p in pages if p > last_page]:
+        del pages[page]
+    return collected()[:target]
@@ -0,0 +1,91 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import Lock
+from typing import Dict, List, Tuple
+from PIL import Image
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tiff')
+
+
+class ThumbnailCache:
+    """
+    Disk-persisted thumbnails generated on a background pool.
+    Thumbnails are keyed by the source file's inode, size and mtime, so edited
+    files get a fresh thumbnail and hard-linked views of one image share one.
+    """
+
+    def __init__(self, cache_dir: str = os.path.join("downloaded_images", ".thumbnails"),
+                 size: Tuple[int, int] = (320, 320), workers: int = 4):
+        self.cache_dir = cache_dir
+        self.size = size
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self._pending: Dict[str, object] = {}
+        self._lock = Lock()
+
+    def key(self, path: str) -> str:
+        st = os.stat(path)
+        raw = f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}:{self.size[0]}x{self.size[1]}"
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def thumbnail_path(self, path: str) -> str:
+        key = self.key(path)
+        return os.path.join(self.cache_dir, key[:2], f"{key}.jpg")
+
+    def _render(self, path: str, thumb_path: str) -> str:
+        os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+        tmp_path = f"{thumb_path}.tmp"
+        with Image.open(path) as img:
+            # Let the JPEG decoder downscale while decoding
+            img.draft('RGB', self.size)
+            img.thumbnail(self.size)
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            img.save(tmp_path, 'JPEG', quality=80)
+        os.replace(tmp_path, thumb_path)
+        return thumb_path
+
+    def submit(self, path: str):
+        """Schedule thumbnail generation unless it is cached or already queued"""
+        thumb_path = self.thumbnail_path(path)
+        with self._lock:
+            future = self._pending.get(thumb_path)
+            if future is None and not os.path.exists(thumb_path):
+                future = self.executor.submit(self._render, path, thumb_path)
+                self._pending[thumb_path] = future
+                future.add_done_callback(lambda _: self._forget(thumb_path))
+        return thumb_path, future
+
+    def _forget(self, thumb_path: str):
+        with self._lock:
+            self._pending.pop(thumb_path, None)
+
+    def prefetch(self, paths: List[str]):
+        """Generate thumbnails in the background without waiting"""
+        for path in paths:
+            try:
+                self.submit(path)
+            except OSError:
+                continue
+
+    def get_many(self, paths: List[str], timeout: float = 30) -> List[str]:
+        """
+        Return thumbnail paths for the given images, generating missing ones in parallel.
+        Falls back to the original path when a thumbnail cannot be made.
+        """
+        jobs = []
+        for path in paths:
+            try:
+                jobs.append((path, *self.submit(path)))
+            except OSError:
+                jobs.append((path, None, None))
+
+        wait([future for _, _, future in jobs if future is not None], timeout=timeout)
+
+        results = []
+        for path, thumb_path, future in jobs:
+            if thumb_path and os.path.exists(thumb_path):
+                results.append(thumb_path)
+            else:
+                results.append(path)
+        return results
@@ -0,0 +1,97 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from services.api_cache import TTLCache
+
+VERDICT_CACHE_PATH = os.getenv("URL_VERDICT_CACHE_PATH", os.path.join("cache", "url_verdicts.sqlite3"))
+
+# Statuses that mean the image is gone rather than temporarily unavailable
+GONE_STATUSES = (404, 410)
+
+_default_validator = None
+_default_validator_lock = threading.Lock()
+
+
+def is_excluded(url: str) -> bool:
+    """URLs rejected without a request: inline data and formats we don't keep"""
+    return 'data:image' in url or url.split('?')[0].lower().endswith(('.svg', '.gif'))
+
+
+class URLValidator:
+    """
+    Batch HEAD-checks image URLs over a pooled session.
+    Verdicts are cached on disk by URL for `ttl` seconds, so a URL is checked
+    at most once per TTL across runs.
+    """
+
+    def __init__(self, cache: Optional[TTLCache] = None, ttl: float = 7 * 86400,
+                 max_workers: int = 16, timeout: float = 5, batch_timeout: float = 8):
+        self.cache = cache or TTLCache(VERDICT_CACHE_PATH, ttl=ttl, stale_ttl=0, max_entries=100000)
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.batch_timeout = batch_timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def check(self, url: str) -> Optional[bool]:
+        """
+        HEAD a single URL and check it serves an image
+        Returns None when the answer is inconclusive (429, 5xx or another error status).
+        """
+        response = self.session.head(url, timeout=self.timeout, allow_redirects=True)
+        if response.status_code in GONE_STATUSES:
+            return False
+        if response.status_code >= 400:
+            return None
+        return 'image' in response.headers.get('content-type', '').lower()
+
+    def validate(self, urls: Iterable[str]) -> Dict[str, bool]:
+        """
+        Validate URLs concurrently, answering from the verdict cache where possible.
+        URLs still unchecked after batch_timeout, failed requests and inconclusive
+        responses count as invalid and are not cached.
+        """
+        verdicts = {}
+        pending = {}
+        for url in dict.fromkeys(urls):
+            if is_excluded(url):
+                verdicts[url] = False
+                continue
+            cached, state = self.cache.get(url)
+            if state == "fresh":
+                verdicts[url] = cached
+            else:
+                pending[self.executor.submit(self.check, url)] = url
+
+        done, not_done = wait(pending, timeout=self.batch_timeout)
+        for future in done:
+            url = pending[future]
+            try:
+                verdict = future.result()
+            except requests.RequestException:
+                verdict = None
+            verdicts[url] = bool(verdict)
+            if verdict is not None:
+                self.cache.set(url, verdict)
+        for future in not_done:
+            future.cancel()
+            verdicts[pending[future]] = False
+
+        return verdicts
+
+
+def get_default_validator() -> URLValidator:
+    """Process-wide validator sharing one session and verdict cache"""
+    global _default_validator
+    with _default_validator_lock:
+        if _default_validator is None:
+            _default_validator = URLValidator()
+        return _default_validator
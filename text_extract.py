@@ -0,0 +1,90 @@
+import os
+import re
+from typing import Callable, Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    try:  # selectolax < 1.0 only ships the Modest parser
+        from selectolax.parser import HTMLParser as SelectolaxParser
+    except ImportError:  # optional fast backend
+        SelectolaxParser = None
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:  # optional fast backend
+    etree = None
+    lxml_html = None
+
+# Elements whose text never reaches the reader
+DROPPED_TAGS = ("script", "style", "noscript")
+
+# Same boundaries clean_body_content always used: every line break str.splitlines()
+# recognises, plus each pair of spaces inside a line
+_PHRASE_BOUNDARY = re.compile(r'\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]|  ')
+
+DEFAULT_BACKEND = os.getenv("EXTRACTION_BACKEND", "auto")
+
+
+def extract_with_bs4(html_content: str) -> str:
+    soup = BeautifulSoup(html_content, 'html.parser')
+    for element in soup(list(DROPPED_TAGS)):
+        element.decompose()
+    return soup.get_text()
+
+
+def extract_with_lxml(html_content: str) -> str:
+    parser = lxml_html.HTMLParser(remove_comments=True, remove_pis=True)
+    try:
+        root = lxml_html.document_fromstring(html_content, parser=parser)
+    except etree.ParserError:
+        # "Document is empty": blank or comment-only input, which bs4 turns into ""
+        return ""
+    # One C-level pass over the tree; the text following each element is kept
+    etree.strip_elements(root, *DROPPED_TAGS, with_tail=False)
+    return "".join(root.itertext())
+
+
+def extract_with_selectolax(html_content: str) -> str:
+    tree = SelectolaxParser(html_content)
+    tree.strip_tags(list(DROPPED_TAGS))
+    return tree.root.text(separator="") if tree.root is not None else ""
+
+
+BACKENDS: Dict[str, Callable[[str], str]] = {"bs4": extract_with_bs4}
+if lxml_html is not None:
+    BACKENDS["lxml"] = extract_with_lxml
+if SelectolaxParser is not None:
+    BACKENDS["selectolax"] = extract_with_selectolax
+
+
+def available_backends() -> List[str]:
+    return list(BACKENDS)
+
+
+def get_backend(name: Optional[str] = None) -> Callable[[str], str]:
+    """
+    Resolve an extraction backend by name
+    "auto" picks the fastest installed one: selectolax, then lxml, then bs4.
+    """
+    name = name or DEFAULT_BACKEND
+    if name == "auto":
+        for candidate in ("selectolax", "lxml", "bs4"):
+            if candidate in BACKENDS:
+                return BACKENDS[candidate]
+    if name not in BACKENDS:
+        raise ValueError(f"Extraction backend '{name}' is not available; installed: {available_backends()}")
+    return BACKENDS[name]
+
+
+def extract_text(html_content: str, backend: Optional[str] = None) -> str:
+    """Visible text of a page with script, style and noscript content removed"""
+    return get_backend(backend)(html_content)
+
+
+def normalize_whitespace(content: str) -> str:
+    """One phrase per line, no blank lines; a single split instead of splitting lines then phrases"""
+    return '\n'.join(filter(None, map(str.strip, _PHRASE_BOUNDARY.split(content))))
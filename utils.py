@@ -1,12 +1,37 @@
 import subprocess
 import requests
 import os
+import json
+import shutil
+import tempfile
+import threading
 import zipfile
 import platform
+from functools import lru_cache
 from pathlib import Path
+from browser_profiles import FULL, apply_profile, activate_profile
+from browser_network import enable_performance_logging
 
+# Pre-seeded drivers can live anywhere; the manifest sits next to them
+DRIVERS_DIR = Path(os.getenv("CHROMEDRIVER_DIR", str(Path(__file__).parent / "drivers")))
+MANIFEST_NAME = "manifest.json"
+# Never touch the network: only drivers already in DRIVERS_DIR are used
+OFFLINE = os.getenv("CHROMEDRIVER_OFFLINE", "").lower() in ("1", "true", "yes")
+
+# Chrome 115+ drivers are only published through Chrome for Testing
+CFT_FIRST_MAJOR = 115
+CFT_LATEST_URL = "https://googlechromelabs.github.io/chrome-for-testing/LATEST_RELEASE_{major}"
+CFT_DOWNLOAD_URL = "https://storage.googleapis.com/chrome-for-testing-public/{version}/{platform}/chromedriver-{platform}.zip"
+LEGACY_LATEST_URL = "https://chromedriver.storage.googleapis.com/LATEST_RELEASE_{major}"
+LEGACY_DOWNLOAD_URL = "https://chromedriver.storage.googleapis.com/{version}/chromedriver_{platform}.zip"
+
+_driver_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
 def get_chrome_version():
-    """Get the installed Chrome version."""
+    """Get the installed Chrome major version, resolved once per process (CHROME_VERSION overrides)."""
+    if os.getenv("CHROME_VERSION"):
+        return os.getenv("CHROME_VERSION").split('.')[0]
     try:
         # For Ubuntu/Linux
         output = subprocess.check_output(['google-chrome', '--version'])
@@ -21,54 +46,152 @@ def get_chrome_version():
         except:
             raise Exception("Could not determine Chrome version. Is Chrome installed?")
 
-def download_chromedriver():
-    """Download and setup the correct ChromeDriver version."""
+def chromedriver_platform(chrome_major):
+    """Platform name used in download URLs for this OS and Chrome generation"""
+    system = platform.system()
+    cft = int(chrome_major) >= CFT_FIRST_MAJOR
+    if system == "Windows":
+        return "win64" if cft and platform.machine().endswith("64") else "win32"
+    if system == "Darwin":
+        arm = platform.machine() == "arm64"
+        if cft:
+            return "mac-arm64" if arm else "mac-x64"
+        return "mac_arm64" if arm else "mac64"
+    return "linux64"
+
+def chromedriver_name():
+    return "chromedriver.exe" if platform.system() == "Windows" else "chromedriver"
+
+def load_manifest(drivers_dir=DRIVERS_DIR):
+    """Manifest of installed drivers: {chrome_major: {"driver_version", "path", "platform"}}"""
     try:
-        # Get Chrome version
-        chrome_version = get_chrome_version()
-        
-        # Get the latest ChromeDriver version for this Chrome version
-        url = f"https://chromedriver.storage.googleapis.com/LATEST_RELEASE_{chrome_version}"
-        response = requests.get(url)
-        driver_version = response.text.strip()
-
-        # Create drivers directory if it doesn't exist
-        drivers_dir = Path(__file__).parent / "drivers"
-        drivers_dir.mkdir(exist_ok=True)
-
-        # Set the chromedriver path
-        if platform.system() == "Windows":
-            chromedriver_name = "chromedriver.exe"
-        else:
-            chromedriver_name = "chromedriver"
-        
-        chromedriver_path = drivers_dir / chromedriver_name
-
-        # Download ChromeDriver
-        print(f"Downloading ChromeDriver version {driver_version}...")
-        if platform.system() == "Windows":
-            zip_url = f"https://chromedriver.storage.googleapis.com/{driver_version}/chromedriver_win32.zip"
-        else:
-            zip_url = f"https://chromedriver.storage.googleapis.com/{driver_version}/chromedriver_linux64.zip"
-        
-        response = requests.get(zip_url)
-        zip_path = drivers_dir / "chromedriver.zip"
-        
+        with open(Path(drivers_dir) / MANIFEST_NAME) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest, drivers_dir=DRIVERS_DIR):
+    """Write the manifest atomically so concurrent workers never read half a file"""
+    fd, tmp_path = tempfile.mkstemp(dir=drivers_dir, suffix=".json")
+    with os.fdopen(fd, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, Path(drivers_dir) / MANIFEST_NAME)
+
+def find_installed_chromedriver(chrome_major, drivers_dir=DRIVERS_DIR):
+    """Path of an installed driver matching chrome_major, or None"""
+    entry = load_manifest(drivers_dir).get(str(chrome_major))
+    if entry:
+        path = Path(drivers_dir) / entry["path"]
+        if path.is_file() and os.access(path, os.X_OK):
+            return str(path)
+    return None
+
+def latest_driver_version(chrome_major):
+    """Ask the release endpoint which driver matches this Chrome major version"""
+    if int(chrome_major) >= CFT_FIRST_MAJOR:
+        url = CFT_LATEST_URL.format(major=chrome_major)
+    else:
+        url = LEGACY_LATEST_URL.format(major=chrome_major)
+    response = requests.get(url, timeout=15)
+    response.raise_for_status()
+    return response.text.strip()
+
+def install_chromedriver(chrome_major, drivers_dir=DRIVERS_DIR):
+    """Download the matching driver into drivers_dir/<version>/ and record it in the manifest"""
+    driver_version = latest_driver_version(chrome_major)
+    driver_platform = chromedriver_platform(chrome_major)
+    if int(chrome_major) >= CFT_FIRST_MAJOR:
+        zip_url = CFT_DOWNLOAD_URL.format(version=driver_version, platform=driver_platform)
+    else:
+        zip_url = LEGACY_DOWNLOAD_URL.format(version=driver_version, platform=driver_platform)
+
+    print(f"Downloading ChromeDriver version {driver_version}...")
+    response = requests.get(zip_url, timeout=120)
+    response.raise_for_status()
+
+    # Unpack beside the final location and rename into place in one step
+    staging = Path(tempfile.mkdtemp(dir=drivers_dir))
+    try:
+        zip_path = staging / "chromedriver.zip"
         with open(zip_path, 'wb') as f:
             f.write(response.content)
-
-        # Extract ChromeDriver
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(drivers_dir)
+            zip_ref.extractall(staging)
+        os.remove(zip_path)
 
-        # Make ChromeDriver executable on Linux/Mac
-        if platform.system() != "Windows":
-            os.chmod(chromedriver_path, 0o755)
+        # Chrome for Testing zips nest the binary in chromedriver-<platform>/
+        binary = next(staging.rglob(chromedriver_name()))
+        target_dir = Path(drivers_dir) / driver_version
+        shutil.rmtree(target_dir, ignore_errors=True)
+        os.replace(binary.parent, target_dir)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
 
-        # Clean up
-        os.remove(zip_path)
-        
-        return str(chromedriver_path)
+    chromedriver_path = target_dir / chromedriver_name()
+    # Make ChromeDriver executable on Linux/Mac
+    if platform.system() != "Windows":
+        os.chmod(chromedriver_path, 0o755)
+
+    manifest = load_manifest(drivers_dir)
+    manifest[str(chrome_major)] = {
+        "driver_version": driver_version,
+        "path": str(chromedriver_path.relative_to(drivers_dir)),
+        "platform": driver_platform,
+    }
+    save_manifest(manifest, drivers_dir)
+    return str(chromedriver_path)
+
+def download_chromedriver(offline=None):
+    """
+    Return a ChromeDriver matching the installed Chrome, downloading it only when
+    no matching binary is recorded in the manifest.
+    In offline mode (CHROMEDRIVER_OFFLINE=1) a missing driver is an error instead.
+    """
+    offline = OFFLINE if offline is None else offline
+    try:
+        # Get Chrome version
+        chrome_version = get_chrome_version()
+
+        with _driver_lock:
+            installed = find_installed_chromedriver(chrome_version)
+            if installed:
+                return installed
+            if offline:
+                # A bare driver seeded without a manifest (the old drivers/ layout)
+                seeded = DRIVERS_DIR / chromedriver_name()
+                if seeded.is_file():
+                    return str(seeded)
+                raise Exception(
+                    f"No ChromeDriver for Chrome {chrome_version} in {DRIVERS_DIR} and offline mode is on"
+                )
+            DRIVERS_DIR.mkdir(parents=True, exist_ok=True)
+            return install_chromedriver(chrome_version)
 
     except Exception as e:
-        raise Exception(f"Failed to setup ChromeDriver: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Failed to setup ChromeDriver: {str(e)}")
+
+def get_undetected_driver(headless=True, network_logging=False, profile=FULL):
+    """
+    Start undetected Chrome with the managed ChromeDriver
+    network_logging records DevTools network events for NetworkRecorder.
+    """
+    import undetected_chromedriver as uc
+
+    options = uc.ChromeOptions()
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--no-sandbox")
+    if profile == FULL:
+        options.add_argument("--window-size=1920,1080")
+    if headless:
+        options.add_argument('--headless=new')
+    if network_logging:
+        enable_performance_logging(options)
+    apply_profile(options, profile)
+
+    driver = uc.Chrome(
+        options=options,
+        driver_executable_path=download_chromedriver(),
+        version_main=int(get_chrome_version())
+    )
+    return activate_profile(driver, profile)
\ No newline at end of file